@@ -0,0 +1,99 @@
+import gc
+import sys
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.fixtures import events_payload_bytes
+from decoder import format_timestamp, iter_chunks, iter_events, match_from_event
+
+# Comparaison du décodage de "scheduled-events" : chemin historique (response.json() puis
+# un dictionnaire par événement) contre décodage incrémental vers des Match compacts.
+#
+# Utilisation (depuis la racine du dépôt) :
+#   python -m benchmarks.decoder_benchmark                 # réponses synthétiques
+#   python -m benchmarks.decoder_benchmark capture.json    # réponses enregistrées
+
+SYNTHETIC_SIZES = (500, 2000, 5000)
+REPEAT = 5
+
+
+# Chemin historique de fetch_football_data(), reproduit à l'identique
+def legacy_decode(content):
+    events = json.loads(content).get("events", [])
+    matches = []
+    for event in events:
+        match = {
+            "homeTeam": event.get("homeTeam", {}).get("name", "Unknown"),
+            "awayTeam": event.get("awayTeam", {}).get("name", "Unknown"),
+            "startTime": datetime.fromtimestamp(event.get("startTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("startTimestamp") else "Unknown",
+            "id": event.get("id", "Unknown"),
+            "seasonId": event.get("season", {}).get("id", "Unknown"),
+            "homeScore": event.get("homeScore", {}).get("display", 0),
+            "awayScore": event.get("awayScore", {}).get("display", 0),
+            "status": event.get("status", {}).get("type", "Unknown"),
+            "tournament": event.get("tournament", {}).get("name", "Unknown")
+        }
+        if match["status"] == "finished":
+            match["endTime"] = datetime.fromtimestamp(event.get("lastUpdatedTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("lastUpdatedTimestamp") else "Unknown"
+        elif match["status"] == "inprogress":
+            match["currentTime"] = datetime.fromtimestamp(event.get("lastUpdatedTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("lastUpdatedTimestamp") else "Unknown"
+        matches.append(match)
+    return matches
+
+
+# Chemin actuel : événements décodés un par un, seuls les champs utiles sont conservés
+def streaming_decode(content):
+    return [match_from_event(event) for event in iter_events(iter_chunks(content))]
+
+
+# Meilleur temps sur REPEAT exécutions (cache de formatage vidé pour un départ à froid)
+def measure_time(decode, content):
+    best = float("inf")
+    for _ in range(REPEAT):
+        format_timestamp.cache_clear()
+        gc.collect()
+        start = time.perf_counter()
+        decode(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Pic mémoire pendant le décodage (le contenu brut, déjà en mémoire, n'est pas compté)
+def measure_peak(decode, content):
+    format_timestamp.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    result = decode(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def run(label, content):
+    legacy_time = measure_time(legacy_decode, content)
+    streaming_time = measure_time(streaming_decode, content)
+    legacy_peak = measure_peak(legacy_decode, content)
+    streaming_peak = measure_peak(streaming_decode, content)
+    print(
+        f"{label:<28} {len(content) / 1e6:6.2f} MB | "
+        f"temps {legacy_time * 1000:8.1f} ms -> {streaming_time * 1000:8.1f} ms | "
+        f"pic mémoire {legacy_peak / 1e6:7.2f} MB -> {streaming_peak / 1e6:7.2f} MB"
+    )
+
+
+def main(paths):
+    print(f"{'jeu de données':<28} {'taille':>9} | historique -> incrémental")
+    if paths:
+        for path in paths:
+            with open(path, "rb") as f:
+                run(path, f.read())
+    else:
+        for size in SYNTHETIC_SIZES:
+            run(f"synthétique {size} matchs", events_payload_bytes(size))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
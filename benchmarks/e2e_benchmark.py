@@ -0,0 +1,176 @@
+import io
+import os
+import sys
+import time
+import logging
+import contextlib
+import asyncio
+import argparse
+import statistics
+import multiprocessing
+from aiohttp import web, ClientSession
+
+from benchmarks.mock_upstream import MockUpstream
+
+# Benchmark de bout en bout : le service tourne contre le serveur local de
+# benchmarks/mock_upstream.py (lancé dans un processus séparé) et l'on mesure, pour chaque
+# boucle, la latence d'un cycle, le nombre de requêtes amont par cycle et le temps CPU par
+# cycle, puis le débit et le p99 des routes /results et /live_matches.
+#
+# Utilisation (depuis la racine du dépôt) :
+#   python -m benchmarks.e2e_benchmark --matches 1000 --latency 0.02 --cycles 10
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout contre un serveur amont local")
+    parser.add_argument("--matches", type=int, default=500, help="nombre de matchs synthétiques")
+    parser.add_argument("--live-ratio", type=float, default=0.2, help="part des matchs en cours")
+    parser.add_argument("--latency", type=float, default=0.01, help="latence amont par requête (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des requêtes amont en erreur")
+    parser.add_argument("--cycles", type=int, default=5, help="nombre de cycles mesurés par boucle")
+    parser.add_argument("--interval", type=float, default=2.0, help="pause entre deux cycles (s)")
+    parser.add_argument("--route-seconds", type=float, default=3.0, help="durée du test de chaque route (s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients simultanés sur les routes")
+    parser.add_argument("--upstream-port", type=int, default=8101)
+    parser.add_argument("--service-port", type=int, default=8102)
+    return parser.parse_args(argv)
+
+
+# Serveur amont lancé dans son propre processus (son CPU n'est pas compté dans celui du service)
+def run_upstream(args):
+    upstream = MockUpstream(matches=args.matches, live_ratio=args.live_ratio,
+                            latency=args.latency, error_rate=args.error_rate)
+    web.run_app(upstream.create_app(), host="127.0.0.1", port=args.upstream_port, print=None)
+
+
+async def upstream_requests(session, base):
+    async with session.get(f"{base}/_stats") as response:
+        data = await response.json()
+    return sum(data["requests"].values())
+
+
+async def wait_for_upstream(session, base, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await upstream_requests(session, base)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Mesurer `cycles` cycles d'une boucle : latence, requêtes amont et CPU par cycle
+async def measure_poller(name, cycle, session, base, args):
+    latencies, requests, cpu = [], [], []
+    for _ in range(args.cycles):
+        before_requests = await upstream_requests(session, base)
+        before_cpu = time.process_time()
+        start = time.perf_counter()
+        # Les messages de progression des boucles sont masqués pendant la mesure
+        with contextlib.redirect_stdout(io.StringIO()):
+            await cycle()
+        latencies.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - before_cpu)
+        requests.append(await upstream_requests(session, base) - before_requests)
+        await asyncio.sleep(args.interval)
+    print(
+        f"{name:<12} cycle moy {statistics.mean(latencies) * 1000:8.1f} ms  max {max(latencies) * 1000:8.1f} ms | "
+        f"requêtes amont/cycle {statistics.mean(requests):7.1f} | CPU/cycle {statistics.mean(cpu) * 1000:7.1f} ms"
+    )
+
+
+# Marteler une route pendant `seconds` secondes avec `concurrency` clients
+async def measure_route(session, url, args, conditional=False):
+    latencies = []
+    statuses = {}
+    # Même Accept-Encoding pour la requête initiale : chaque codage a son propre ETag
+    headers = {"Accept-Encoding": "gzip"}
+    if conditional:
+        async with session.get(url, headers=headers) as response:
+            await response.read()
+            etag = response.headers.get("ETag")
+        if etag:
+            headers["If-None-Match"] = etag
+    deadline = time.monotonic() + args.route_seconds
+
+    async def worker():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    label = f"{url.rsplit('/', 1)[-1]}{' (304)' if conditional else ''}"
+    print(
+        f"/{label:<22} {len(latencies) / elapsed:9.0f} req/s | p50 {percentile(latencies, 0.5) * 1000:6.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:6.2f} ms | statuts {statuses}"
+    )
+
+
+async def run(args):
+    upstream_base = f"http://127.0.0.1:{args.upstream_port}"
+
+    # La configuration est lue à l'import : la fixer avant de charger les modules du service
+    os.environ["SOFASCORE_API_BASE"] = upstream_base
+    import foot
+    import scores
+    import incidents
+    import classements
+    import server
+    from client import client
+    from snapshot import foot_store, scores_store, incidents_store, classements_store
+
+    # Ne pas écraser les fichiers JSON du dépôt ni noyer les mesures dans les journaux
+    for store in (foot_store, scores_store, incidents_store, classements_store):
+        store.checkpoint_path = None
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async with ClientSession() as session:
+        await wait_for_upstream(session, upstream_base)
+
+        print(f"--- Boucles ({args.matches} matchs, latence amont {args.latency * 1000:.0f} ms) ---")
+        await measure_poller("foot", lambda: asyncio.to_thread(foot.save_football_data), session, upstream_base, args)
+        await measure_poller("scores", scores.filter_and_save_matches, session, upstream_base, args)
+        await measure_poller("incidents", incidents.filter_and_save_matches, session, upstream_base, args)
+        await measure_poller("classements", lambda: classements.refresh_matches(foot_store), session, upstream_base, args)
+
+        # Routes servies sans les boucles, sur les snapshots produits ci-dessus
+        runner = web.AppRunner(server.create_app(pollers=False), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.service_port).start()
+        try:
+            print(f"--- Routes ({args.concurrency} clients, {args.route_seconds:.0f} s par route) ---")
+            service_base = f"http://127.0.0.1:{args.service_port}"
+            for path in ("/results", "/live_matches"):
+                await measure_route(session, service_base + path, args)
+                await measure_route(session, service_base + path, args, conditional=True)
+        finally:
+            await runner.cleanup()
+            await client.close()
+            foot.fetcher.shutdown()
+            foot.day_fetcher.shutdown()
+
+
+def main(argv):
+    args = parse_args(argv)
+    upstream = multiprocessing.Process(target=run_upstream, args=(args,), daemon=True)
+    upstream.start()
+    try:
+        asyncio.run(run(args))
+    finally:
+        upstream.terminate()
+        upstream.join()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+import json
+import random
+from datetime import datetime
+
+# Jeux de données pour les benchmarks : réponses "scheduled-events" au format de l'API,
+# reconstruites à partir des matchs enregistrés dans foot.json puis démultipliées.
+
+FOOT_FILE = "foot.json"
+
+STATUS_CODES = {"notstarted": 0, "inprogress": 7, "finished": 100}
+
+
+# Charger les matchs enregistrés (toutes catégories confondues)
+def recorded_matches(path=FOOT_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("finished", []) + data.get("ongoing", []) + data.get("upcoming", [])
+
+
+def _timestamp(value):
+    try:
+        return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+# Événement brut tel que renvoyé par l'API (avec les nombreux champs que nous n'utilisons pas)
+def upstream_event(match, event_id, rng):
+    start = _timestamp(match.get("startTime")) or 1734840000 + rng.randint(0, 86400)
+    status = match.get("status", "notstarted")
+    event = {
+        "tournament": {
+            "name": match.get("tournament", "Unknown"),
+            "slug": match.get("tournament", "unknown").lower().replace(" ", "-"),
+            "category": {"name": "World", "slug": "world", "sport": {"name": "Football", "slug": "football", "id": 1}, "id": 1469, "flag": "international"},
+            "uniqueTournament": {"name": match.get("tournament", "Unknown"), "id": rng.randint(1, 20000), "userCount": rng.randint(0, 900000), "hasEventPlayerStatistics": True},
+            "priority": rng.randint(0, 600),
+            "id": rng.randint(1, 200000)
+        },
+        "season": {"name": "24/25", "year": "24/25", "editor": False, "id": match.get("seasonId", 0)},
+        "roundInfo": {"round": rng.randint(1, 38)},
+        "customId": "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJ") for _ in range(6)),
+        "status": {"code": STATUS_CODES.get(status, 0), "description": status.capitalize(), "type": status},
+        "winnerCode": 0,
+        "homeTeam": {"name": match.get("homeTeam", "Unknown"), "slug": "home", "shortName": match.get("homeTeam", "Unknown"), "gender": "M", "userCount": rng.randint(0, 500000), "nameCode": "HOM", "national": False, "type": 0, "id": rng.randint(1, 500000), "teamColors": {"primary": "#374df5", "secondary": "#374df5", "text": "#ffffff"}},
+        "awayTeam": {"name": match.get("awayTeam", "Unknown"), "slug": "away", "shortName": match.get("awayTeam", "Unknown"), "gender": "M", "userCount": rng.randint(0, 500000), "nameCode": "AWA", "national": False, "type": 0, "id": rng.randint(1, 500000), "teamColors": {"primary": "#ffffff", "secondary": "#000000", "text": "#000000"}},
+        "homeScore": {},
+        "awayScore": {},
+        "time": {"injuryTime1": 2, "injuryTime2": 4, "currentPeriodStartTimestamp": start},
+        "changes": {"changes": ["status.code", "homeScore.current"], "changeTimestamp": start + 3000},
+        "hasGlobalHighlights": False,
+        "hasEventPlayerStatistics": True,
+        "hasEventPlayerHeatMap": True,
+        "detailId": 1,
+        "crowdsourcingDataDisplayEnabled": False,
+        "id": event_id,
+        "startTimestamp": start,
+        "slug": "home-away",
+        "finalResultOnly": False,
+        "feedLocked": True,
+        "isEditor": False
+    }
+    if status != "notstarted":
+        event["homeScore"] = {"current": match.get("homeScore", 0), "display": match.get("homeScore", 0), "period1": 0, "normaltime": match.get("homeScore", 0)}
+        event["awayScore"] = {"current": match.get("awayScore", 0), "display": match.get("awayScore", 0), "period1": 0, "normaltime": match.get("awayScore", 0)}
+        event["lastUpdatedTimestamp"] = start + rng.randint(60, 7000)
+    return event
+
+
+# Réponse complète de `count` événements (les matchs enregistrés sont réutilisés en boucle)
+def events_payload(count, seed=0, path=FOOT_FILE):
+    rng = random.Random(seed)
+    matches = recorded_matches(path)
+    return {"events": [upstream_event(matches[i % len(matches)], 10_000_000 + i, rng) for i in range(count)]}
+
+
+def events_payload_bytes(count, seed=0, path=FOOT_FILE):
+    return json.dumps(events_payload(count, seed, path), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,175 @@
+import sys
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+from benchmarks.fixtures import events_payload
+
+# Serveur local qui remplace l'API SofaScore pour les benchmarks.
+# Il sert les quatre endpoints utilisés par le service, sur N matchs synthétiques
+# construits à partir de foot.json, avec une latence et un taux d'erreur configurables.
+#
+# Utilisation autonome (depuis la racine du dépôt) :
+#   python -m benchmarks.mock_upstream --matches 1000 --latency 0.05 --error-rate 0.01
+#   SOFASCORE_API_BASE=http://127.0.0.1:8001 python run_all.py
+
+DEFAULT_PORT = 8001
+
+ENDPOINTS = ("scheduled-events", "odds", "incidents", "lineups")
+
+
+class MockUpstream:
+    def __init__(self, matches=500, live_ratio=0.2, latency=0.0, jitter=0.0,
+                 error_rate=0.0, change_rate=0.05, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.change_rate = change_rate
+        self.rng = random.Random(seed)
+        self.requests = dict.fromkeys(ENDPOINTS, 0)
+        self.errors = dict.fromkeys(ENDPOINTS, 0)
+
+        # Matchs synthétiques : une part `live_ratio` est en cours, le reste se répartit
+        # entre matchs terminés et à venir
+        self.events = events_payload(matches, seed)["events"]
+        for event in self.events:
+            roll = self.rng.random()
+            status = "inprogress" if roll < live_ratio else ("finished" if roll < (1 + live_ratio) / 2 else "notstarted")
+            event["status"] = {"code": 0, "description": status, "type": status}
+            if status == "notstarted":
+                event["homeScore"] = {}
+                event["awayScore"] = {}
+                event.pop("lastUpdatedTimestamp", None)
+            else:
+                event.setdefault("homeScore", {}).setdefault("display", 0)
+                event.setdefault("awayScore", {}).setdefault("display", 0)
+                event.setdefault("lastUpdatedTimestamp", event["startTimestamp"] + 60)
+        self.live_ids = [event["id"] for event in self.events if event["status"]["type"] == "inprogress"]
+        self.incident_counts = dict.fromkeys(self.live_ids, 1)
+
+    # Latence simulée et erreurs aléatoires communes à tous les endpoints
+    async def _simulate(self, endpoint):
+        self.requests[endpoint] += 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors[endpoint] += 1
+            status = self.rng.choice((429, 500, 503))
+            return web.Response(status=status, headers={"Retry-After": "1"})
+        return None
+
+    # Faire évoluer une partie des matchs en cours (scores et horodatage)
+    def _advance(self):
+        for event in self.events:
+            if event["status"]["type"] == "inprogress" and self.rng.random() < self.change_rate:
+                event["lastUpdatedTimestamp"] += 30
+                if self.rng.random() < 0.3:
+                    event["homeScore"]["display"] = event["homeScore"].get("display", 0) + 1
+                if event["id"] in self.incident_counts:
+                    self.incident_counts[event["id"]] += 1
+
+    async def scheduled_events(self, request):
+        error = await self._simulate("scheduled-events")
+        if error is not None:
+            return error
+        self._advance()
+        return web.json_response({"events": self.events})
+
+    async def odds(self, request):
+        error = await self._simulate("odds")
+        if error is not None:
+            return error
+        rng = random.Random(int(request.match_info["event_id"]) + self.requests["odds"] // 50)
+        choices = [
+            {"name": name, "fractionalValue": f"{rng.randint(1, 20)}/{rng.randint(1, 10)}"}
+            for name in ("1", "X", "2")
+        ]
+        return web.json_response({"featured": {"default": {"choices": choices}}})
+
+    async def incidents(self, request):
+        error = await self._simulate("incidents")
+        if error is not None:
+            return error
+        event_id = int(request.match_info["event_id"])
+        count = self.incident_counts.get(event_id, 0)
+        incidents = [
+            {
+                "id": event_id * 100 + index,
+                "isLive": True,
+                "incidentType": ("goal", "card", "substitution")[index % 3],
+                "time": min(90, index * 7 + 1),
+                "isHome": index % 2 == 0,
+                "player": {"name": f"Player {index}", "id": event_id * 100 + index},
+                "playerIn": {"name": f"Player In {index}"},
+                "playerOut": {"name": f"Player Out {index}"},
+                "homeScore": index // 2,
+                "awayScore": index // 3,
+                "cardType": "yellow"
+            }
+            for index in range(count)
+        ]
+        return web.json_response({"incidents": incidents})
+
+    async def lineups(self, request):
+        error = await self._simulate("lineups")
+        if error is not None:
+            return error
+        event_id = int(request.match_info["event_id"])
+
+        def player(index):
+            return {
+                "player": {"name": f"Player {event_id}-{index}", "shortName": f"P. {index}", "id": event_id * 100 + index,
+                           "height": 180, "country": {"name": "France"}, "marketValueCurrency": "EUR",
+                           "dateOfBirthTimestamp": 800000000},
+                "position": "M",
+                "jerseyNumber": str(index),
+                "substitute": index > 11,
+                "statistics": {"minutesPlayed": self.requests["lineups"] % 90}
+            }
+
+        return web.json_response({
+            "confirmed": True,
+            "home": {"players": [player(index) for index in range(1, 19)]},
+            "away": {"players": [player(index) for index in range(19, 37)]}
+        })
+
+    # Compteurs de requêtes par endpoint (lus par les benchmarks)
+    async def stats(self, request):
+        return web.json_response({"requests": self.requests, "errors": self.errors})
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get("/sport/football/scheduled-events/{date}", self.scheduled_events)
+        app.router.add_get(r"/event/{event_id:\d+}/odds/1/featured", self.odds)
+        app.router.add_get(r"/event/{event_id:\d+}/incidents", self.incidents)
+        app.router.add_get(r"/event/{event_id:\d+}/lineups", self.lineups)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Serveur local remplaçant l'API SofaScore")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--matches", type=int, default=500, help="nombre de matchs synthétiques")
+    parser.add_argument("--live-ratio", type=float, default=0.2, help="part des matchs en cours")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence par requête (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latence aléatoire supplémentaire (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des requêtes en erreur")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="part des matchs en cours modifiés par cycle")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    upstream = MockUpstream(
+        matches=args.matches, live_ratio=args.live_ratio, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, change_rate=args.change_rate, seed=args.seed
+    )
+    web.run_app(upstream.create_app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
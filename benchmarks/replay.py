@@ -0,0 +1,128 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from capture import read_records
+from decoder import iter_chunks
+from foot import structure_football_data
+from scores import extract_odds
+from incidents import extract_incidents
+from classements import extract_lineup
+
+# Rejeu d'un journal de capture (CAPTURE_PATH) à travers le code d'extraction des pollers,
+# sans réseau : les réponses enregistrées sont relues dans l'ordre et au rythme d'origine
+# (ou accéléré), puis passées à structure_football_data, extract_odds, extract_incidents
+# et extract_lineup. On mesure le temps d'extraction par endpoint ; --output écrit les
+# résultats (une ligne JSON par réponse) pour comparer deux versions du parsing sur des
+# entrées identiques.
+#
+# Utilisation (depuis la racine du dépôt) :
+#   python -m benchmarks.replay capture.log --speed 10
+#   python -m benchmarks.replay capture.log --speed max --output avant.jsonl
+#   python -m cProfile -s cumtime -m benchmarks.replay capture.log --speed max
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Rejeu d'une capture des réponses amont")
+    parser.add_argument("path", help="journal écrit avec CAPTURE_PATH")
+    parser.add_argument("--speed", default="1", help="facteur d'accélération (1, 10...) ou 'max'")
+    parser.add_argument("--endpoint", action="append", help="ne rejouer que cet endpoint (répétable)")
+    parser.add_argument("--output", help="fichier JSON Lines des résultats d'extraction")
+    return parser.parse_args(argv)
+
+
+class Replayer:
+    def __init__(self):
+        # État de structuration par URL et lineups par match, comme dans les pollers
+        self.football_states = {}
+        self.lineups = {}
+
+    # Extraire une réponse enregistrée ; None pour une réponse sans contenu exploitable
+    def extract(self, header, body):
+        endpoint = header["endpoint"]
+        match_id = header["matchId"]
+        if header["status"] != 200:
+            return None
+        if endpoint == "scheduled-events":
+            state = self.football_states.setdefault(header["url"], {"events": {}, "data": None})
+            return structure_football_data(state, iter_chunks(body))
+        data = json.loads(body)
+        if endpoint == "odds":
+            return extract_odds(data)
+        if endpoint == "incidents":
+            return extract_incidents(match_id, data)
+        if endpoint == "lineups":
+            lineup = extract_lineup(match_id, data, self.lineups.get(match_id))
+            self.lineups[match_id] = lineup
+            return lineup
+        raise ValueError(f"Endpoint inconnu : {endpoint}")
+
+
+def replay(path, speed=None, endpoints=None, output=None):
+    replayer = Replayer()
+    durations = {}
+    sizes = {}
+    errors = {}
+    max_lag = 0.0
+    first_ts = None
+    started = time.perf_counter()
+
+    for header, body in read_records(path):
+        endpoint = header["endpoint"]
+        if endpoints and endpoint not in endpoints:
+            continue
+
+        # Respecter l'écart entre les réponses d'origine, divisé par `speed`
+        if first_ts is None:
+            first_ts = header["ts"]
+        if speed is not None:
+            delay = started + (header["ts"] - first_ts) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+
+        parse_started = time.perf_counter()
+        try:
+            result = replayer.extract(header, body)
+        except Exception as e:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            print(f"Erreur d'extraction ({endpoint}, match {header['matchId']}): {e}")
+            continue
+        durations.setdefault(endpoint, []).append(time.perf_counter() - parse_started)
+        sizes[endpoint] = sizes.get(endpoint, 0) + len(body)
+
+        if output is not None:
+            output.write(json.dumps(
+                {"endpoint": endpoint, "matchId": header["matchId"], "ts": header["ts"], "result": result},
+                ensure_ascii=False, default=dict
+            ))
+            output.write("\n")
+
+    return durations, sizes, errors, max_lag, time.perf_counter() - started
+
+
+def main(argv):
+    args = parse_args(argv)
+    speed = None if args.speed == "max" else float(args.speed)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        durations, sizes, errors, max_lag, elapsed = replay(args.path, speed, args.endpoint, output)
+    finally:
+        if output is not None:
+            output.close()
+
+    print(f"{'endpoint':<18}{'réponses':>10}{'Mo':>9}{'total (s)':>11}{'moy (ms)':>10}{'p99 (ms)':>10}{'erreurs':>9}")
+    for endpoint, samples in sorted(durations.items()):
+        p99 = statistics.quantiles(samples, n=100)[98] if len(samples) > 1 else samples[0]
+        print(
+            f"{endpoint:<18}{len(samples):>10}{sizes[endpoint] / 1e6:>9.2f}{sum(samples):>11.3f}"
+            f"{statistics.mean(samples) * 1000:>10.3f}{p99 * 1000:>10.3f}{errors.get(endpoint, 0):>9}"
+        )
+    print(f"Rejeu terminé en {elapsed:.2f}s" + (f" (retard maximal {max_lag:.3f}s)" if speed is not None else ""))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
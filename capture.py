@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import threading
+from config import CAPTURE_PATH
+
+# Capture des réponses amont (activée par la variable d'environnement CAPTURE_PATH).
+# Chaque réponse reçue par les pollers (scheduled-events, cotes, incidents, lineups) est
+# ajoutée à un journal binaire : une longueur sur 4 octets (big-endian) suivie d'un bloc
+# zlib contenant un en-tête JSON (endpoint, id du match, horodatage, statut, URL), un saut
+# de ligne puis le corps brut. Le journal est en ajout seul ; une entrée est écrite en un
+# seul write() sur un descripteur O_APPEND, si bien que les processus de travail
+# (POLL_SHARDS) peuvent écrire dans le même fichier. benchmarks/replay.py le relit.
+
+# Niveau de compression zlib (compromis entre CPU des pollers et taille du journal)
+COMPRESSION_LEVEL = 6
+
+_LENGTH = struct.Struct(">I")
+
+
+class CaptureLog:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.records = 0
+
+    # Ajouter une réponse au journal
+    def record(self, endpoint, match_id, status, body, url=None):
+        header = json.dumps({
+            "endpoint": endpoint,
+            "matchId": match_id,
+            "ts": time.time(),
+            "status": status,
+            "url": url
+        }).encode("utf-8")
+        payload = zlib.compress(header + b"\n" + (body or b""), COMPRESSION_LEVEL)
+        entry = _LENGTH.pack(len(payload)) + payload
+        with self._lock:
+            if self._fd is None:
+                return
+            try:
+                os.write(self._fd, entry)
+            except OSError as e:
+                logging.error(f"Erreur lors de l'écriture de la capture {self.path}: {e}")
+                return
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+# Relire un journal de capture : (en-tête, corps) par entrée, dans l'ordre d'écriture.
+# Une dernière entrée tronquée (arrêt pendant l'écriture) est ignorée.
+def read_records(path):
+    with open(path, "rb") as f:
+        while True:
+            prefix = f.read(_LENGTH.size)
+            if len(prefix) < _LENGTH.size:
+                return
+            (length,) = _LENGTH.unpack(prefix)
+            payload = f.read(length)
+            if len(payload) < length:
+                logging.warning(f"Entrée tronquée à la fin de {path}")
+                return
+            header, _, body = zlib.decompress(payload).partition(b"\n")
+            yield json.loads(header), body
+
+
+# Journal partagé (None si CAPTURE_PATH n'est pas défini)
+recorder = CaptureLog(CAPTURE_PATH) if CAPTURE_PATH else None
@@ -0,0 +1,127 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from metrics import UPSTREAM_ENDPOINTS, upstream_circuit_state, upstream_retries
+
+# Protection des endpoints amont : backoff exponentiel avec jitter et disjoncteur par endpoint.
+# Une réponse de limitation (403/429), une erreur serveur (5xx) ou une erreur réseau suspend
+# l'endpoint pendant le délai de backoff (au moins la durée indiquée par Retry-After) ;
+# après FAILURE_THRESHOLD échecs consécutifs le circuit s'ouvre. Tant qu'il est ouvert, les
+# boucles n'envoient aucune requête et les routes continuent de servir le dernier snapshot publié ;
+# à l'expiration, une seule requête de test (semi-ouvert) décide de sa fermeture.
+
+# Statuts signalant une limitation de débit ou une erreur de l'API
+THROTTLE_STATUSES = (403, 429)
+
+# Échecs consécutifs avant l'ouverture du circuit
+FAILURE_THRESHOLD = 5
+
+# Backoff (en secondes) : BASE_BACKOFF * 2^(échecs - 1), plafonné à MAX_BACKOFF
+BASE_BACKOFF = 1
+MAX_BACKOFF = 120
+
+# Durée minimale d'ouverture du circuit (en secondes)
+OPEN_DURATION = 30
+
+# États du circuit (valeurs exportées dans les métriques)
+CLOSED = 0
+HALF_OPEN = 1
+OPEN = 2
+
+
+# Convertir l'en-tête Retry-After (secondes ou date HTTP) en délai
+def parse_retry_after(value, now=None):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, retry_at - now)
+
+
+class CircuitBreaker:
+    def __init__(self, endpoint, failure_threshold=FAILURE_THRESHOLD, base_backoff=BASE_BACKOFF,
+                 max_backoff=MAX_BACKOFF, open_duration=OPEN_DURATION):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.open_duration = open_duration
+        self.state = CLOSED
+        self.failures = 0
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._state_metric = upstream_circuit_state.labels(endpoint)
+        self._deferred_metric = upstream_retries.labels(endpoint)
+
+    def _set_state(self, state):
+        if state != self.state:
+            logging.warning(f"Circuit {self.endpoint} : {('fermé', 'semi-ouvert', 'ouvert')[state]}")
+        self.state = state
+        self._state_metric.set(state)
+
+    # Nombre de requêtes autorisées maintenant : None (sans limite), 1 (requête de test) ou 0.
+    # `wanted` : requêtes que l'appelant enverrait, ou fonction qui les compte (appelée seulement
+    # si des requêtes sont retenues) ; celles qui sont retenues sont comptées comme reportées
+    def permits(self, wanted=1, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self.blocked_until:
+                self._deferred_metric.inc(wanted() if callable(wanted) else wanted)
+                return 0
+            if self.state == OPEN:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                self._deferred_metric.inc(max(0, (wanted() if callable(wanted) else wanted) - 1))
+                return 1
+            return None
+
+    def allow(self, now=None):
+        return self.permits(now=now) != 0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.blocked_until = 0.0
+                self._set_state(CLOSED)
+
+    def record_failure(self, retry_after=None, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Échec d'une requête partie avant la suspension : seul Retry-After peut la prolonger
+            if now < self.blocked_until and self.state != HALF_OPEN:
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+                return
+
+            self.failures += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+            # Jitter : délai tiré entre la moitié et la totalité du backoff
+            delay = random.uniform(delay / 2, delay)
+            if retry_after:
+                delay = max(delay, retry_after)
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                delay = max(delay, self.open_duration)
+                self._set_state(OPEN)
+            self.blocked_until = now + delay
+
+    # Classer une réponse HTTP : limitation et erreurs serveur sont des échecs,
+    # toute autre réponse (y compris 404 pour un match sans données) prouve que l'endpoint répond
+    def record_response(self, status, retry_after=None):
+        if status in THROTTLE_STATUSES or status >= 500:
+            self.record_failure(parse_retry_after(retry_after))
+        else:
+            self.record_success()
+
+
+# Un disjoncteur par endpoint amont, partagé par tout le processus
+breakers = {endpoint: CircuitBreaker(endpoint) for endpoint in UPSTREAM_ENDPOINTS}
@@ -1,43 +1,132 @@
 import json
 import asyncio
-import aiohttp
 import logging
-from flask import Flask, jsonify
+from aiohttp import web
+from client import client
+from config import API_BASE, POLL_SHARDS
+from circuit import breakers
+from scheduler import PRIORITY_LINEUPS, request_budget
+from snapshot import foot_store, classements_store
+from metrics import LoopTimer
+from storage import storage
+from entities import MAX_PLAYERS, EntityRegistry, normalize_name
+from shards import shard_pool
+from match_events import MatchTracker
+from capture import recorder
+from responses import snapshot_response
 
 # Configuration du logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Créer une instance Flask
-app = Flask(__name__)
+# Routes HTTP du module (servies par server.py)
+routes = web.RouteTableDef()
+
+# Requêtes accordées au lineup d'un match terminé qui reste non confirmé
+MAX_FINISHED_LINEUP_ATTEMPTS = 5
+
+# Taille du cache au-delà de laquelle les lineups qui ne sont plus affichés sont oubliés
+# (ceux des matchs affichés sont toujours conservés)
+MAX_CACHED_LINEUPS = 2000
+
+# Cache des lineups par id de match. Un lineup confirmé d'un match terminé est figé
+# et n'est plus jamais redemandé ; pour un match en cours dont le lineup est confirmé,
+# seules les statistiques des joueurs sont rafraîchies.
+lineup_cache = {}
+
+# Profil d'un joueur (champs indépendants du match), noms normalisés une seule fois
+def build_player_profile(raw):
+    player_id, name, short_name, height, nationality, currency, birth = raw
+    return (player_id, normalize_name(name), normalize_name(short_name), height,
+            normalize_name(nationality), currency, birth)
+
+# Entrée de lineup d'un joueur : profil partagé et champs propres au match
+def build_player_entry(raw):
+    profile, position, jersey_number, is_substitute, statistics = raw
+    player_id, name, short_name, height, nationality, currency, birth = profile
+    return {
+        "id": player_id,
+        "name": name,
+        "shortName": short_name,
+        "position": position,
+        "jerseyNumber": jersey_number,
+        "height": height,
+        "nationality": nationality,
+        "marketValueCurrency": currency,
+        "dateOfBirth": birth,
+        "isSubstitute": is_substitute,
+        "statistics": statistics
+    }
+
+# Registres par id de joueur : une entrée identique d'un fetch à l'autre est réutilisée telle quelle
+player_profiles = EntityRegistry(build_player_profile, MAX_PLAYERS)
+player_entries = EntityRegistry(build_player_entry, MAX_PLAYERS)
 
 # Fonction pour extraire les informations importantes des joueurs
 def extract_player_info(player_data):
+    player = player_data["player"]
+    player_id = player.get("id")
+    profile = player_profiles.get(player_id, (
+        player_id,
+        player["name"],
+        player["shortName"],
+        player.get("height"),
+        player["country"]["name"],
+        player.get("marketValueCurrency"),
+        player.get("dateOfBirthTimestamp")
+    ))
+    return player_entries.get(player_id, (
+        profile,
+        player_data["position"],
+        player_data["jerseyNumber"],
+        player_data.get("substitute", False),
+        player_data.get("statistics", {})
+    ))
+
+# Fonction pour construire un lineup complet à partir de la réponse de l'API
+def build_lineup(match_id, data):
     return {
-        "name": player_data["player"]["name"],
-        "shortName": player_data["player"]["shortName"],
-        "position": player_data["position"],
-        "jerseyNumber": player_data["jerseyNumber"],
-        "height": player_data["player"].get("height"),
-        "nationality": player_data["player"]["country"]["name"],
-        "marketValueCurrency": player_data["player"].get("marketValueCurrency"),
-        "dateOfBirth": player_data["player"].get("dateOfBirthTimestamp"),
-        "isSubstitute": player_data.get("substitute", False),
-        "statistics": player_data.get("statistics", {})
+        "matchId": match_id,
+        "confirmed": data.get("confirmed"),
+        "homeTeam": [extract_player_info(player) for player in data["home"]["players"]],
+        "awayTeam": [extract_player_info(player) for player in data["away"]["players"]]
     }
 
-# Fonction asynchrone pour récupérer les lineups
-async def get_lineup_data(session, match_id):
-    url = f"https://www.sofascore.com/api/v1/event/{match_id}/lineups"
+# Fonction pour ne mettre à jour que les statistiques d'un lineup déjà connu.
+# Les joueurs inchangés sont réutilisés tels quels ; le lineup publié n'est jamais modifié.
+def refresh_statistics(lineup, data):
+    refreshed = dict(lineup)
+    for side, key in (("homeTeam", "home"), ("awayTeam", "away")):
+        statistics = {
+            player["player"].get("id"): player.get("statistics", {})
+            for player in data[key]["players"]
+        }
+        players = []
+        for player in lineup[side]:
+            new_statistics = statistics.get(player["id"], player["statistics"])
+            if new_statistics != player["statistics"]:
+                player = dict(player, statistics=new_statistics)
+            players.append(player)
+        refreshed[side] = players
+    return refreshed
+
+# Fonction pour extraire un lineup d'une réponse de l'API (en partant du lineup en cache s'il est confirmé)
+def extract_lineup(match_id, data, cached=None):
+    if cached is not None and cached.get("confirmed") and data.get("confirmed"):
+        return refresh_statistics(cached, data)
+    return build_lineup(match_id, data)
+
+# Fonction asynchrone pour récupérer les lineups (False si l'API n'a pas de lineup pour ce match)
+async def get_lineup_data(session, match_id, cached=None):
+    url = f"{API_BASE}/event/{match_id}/lineups"
     try:
-        async with session.get(url) as response:
+        async with session.get(url, endpoint="lineups") as response:
+            body = await response.read()
+            if recorder is not None:
+                recorder.record("lineups", match_id, response.status, body, url)
             if response.status == 200:
-                data = await response.json()
-                return {
-                    "matchId": match_id,
-                    "confirmed": data.get("confirmed"),
-                    "homeTeam": [extract_player_info(player) for player in data["home"]["players"]],
-                    "awayTeam": [extract_player_info(player) for player in data["away"]["players"]]
-                }
+                return extract_lineup(match_id, json.loads(body), cached)
+            elif response.status == 404:
+                return False
             else:
                 logging.warning(f"Erreur {response.status} pour le match {match_id}")
                 return None
@@ -45,74 +134,156 @@ async def get_lineup_data(session, match_id):
         logging.error(f"Erreur lors de la récupération des lineups pour le match {match_id}: {e}")
         return None
 
-# Fonction pour traiter les matchs et organiser les résultats
-async def process_matches(file_path):
-    # Charger le fichier local
-    with open(file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
+# Un lineup est figé lorsqu'il est confirmé et que le match est terminé
+def is_frozen(lineup, match_status):
+    return lineup is not None and lineup.get("confirmed") and match_status == "finished"
+
+# Matchs listés par /lineups, tenus à jour par les transitions diffusées par foot.py
+tracker = MatchTracker(statuses=("inprogress", "finished", "notstarted"))
+
+# Ligne publiée de chaque match suivi (sans son lineup)
+match_rows = {}
+
+# Matchs en cours ou terminés dont le lineup n'est pas encore figé
+lineup_candidates = set()
+
+# Requêtes faites pour le lineup de chaque match terminé non figé ; à MAX_FINISHED_LINEUP_ATTEMPTS
+# (ou dès une réponse 404) le lineup n'est plus demandé
+finished_attempts = {}
+
+def match_row(match):
+    return {
+        "id": match["id"],
+        "homeTeam": match["homeTeam"],
+        "awayTeam": match["awayTeam"],
+        "startTime": match.get("startTime"),
+        "status": match["status"]
+    }
+
+# Fonction pour traiter les matchs et organiser les résultats (un cycle)
+async def refresh_matches(store):
+    # Client HTTP partagé : connexions conservées d'un cycle à l'autre
+    session = client
+
+    # Appliquer les transitions du snapshot publié par foot.py (matchs nouveaux, modifiés ou retirés)
+    changes = tracker.refresh(store.current())
+    for match_id in changes.stopped:
+        match_rows.pop(match_id, None)
+        lineup_candidates.discard(match_id)
+        lineup_cache.pop(match_id, None)
+        finished_attempts.pop(match_id, None)
+    for match_id, match in (*changes.started.items(), *changes.updated.items()):
+        match_rows[match_id] = match_row(match)
+        # Les lineups figés ou abandonnés ne sont plus jamais redemandés
+        if (match["status"] != "notstarted" and not is_frozen(lineup_cache.get(match_id), match["status"])
+                and finished_attempts.get(match_id, 0) < MAX_FINISHED_LINEUP_ATTEMPTS):
+            lineup_candidates.add(match_id)
+        else:
+            lineup_candidates.discard(match_id)
+
+    # Premier lot après un démarrage à chaud : oublier les lineups repris des matchs absents
+    if changes.initial:
+        for match_id in [match_id for match_id in lineup_cache if match_id not in match_rows]:
+            del lineup_cache[match_id]
+    to_fetch = list(lineup_candidates)
+
+    # Lineups : classe la moins prioritaire du budget partagé. Les lineups absents du cache
+    # passent en premier, puis les moins récemment rafraîchis ; si l'endpoint est suspendu ou
+    # le budget épuisé, les suivants seront demandés aux cycles suivants (cache inchangé)
+    refresh_order = {match_id: index for index, match_id in enumerate(lineup_cache)}
+    to_fetch.sort(key=lambda match_id: refresh_order.get(match_id, -1))
+    permitted = breakers["lineups"].permits(len(to_fetch))
+    if permitted is not None:
+        to_fetch = to_fetch[:permitted]
+    for index, match_id in enumerate(to_fetch):
+        if not request_budget.try_acquire(PRIORITY_LINEUPS):
+            to_fetch = to_fetch[:index]
+            break
+
+    # Attendre les résultats des tâches (en mode réparti, un lot par processus)
+    if POLL_SHARDS:
+        lineups = await shard_pool().map("lineups", to_fetch, lineup_cache)
+    else:
+        lineups = await asyncio.gather(
+            *(get_lineup_data(session, match_id, lineup_cache.get(match_id)) for match_id in to_fetch),
+            return_exceptions=True
+        )
+    changed_lineups = []
+    for match_id, lineup in zip(to_fetch, lineups):
+        # Match terminé sans lineup confirmé : nombre de requêtes borné, aucune après un 404
+        if match_rows[match_id]["status"] == "finished" and lineup is not None:
+            attempts = MAX_FINISHED_LINEUP_ATTEMPTS if lineup is False else finished_attempts.get(match_id, 0) + 1
+            finished_attempts[match_id] = attempts
+            if attempts >= MAX_FINISHED_LINEUP_ATTEMPTS:
+                lineup_candidates.discard(match_id)
+        if isinstance(lineup, dict):
+            # Réinsertion : l'ordre du cache suit la date du dernier rafraîchissement
+            previous = lineup_cache.pop(match_id, None)
+            lineup_cache[match_id] = lineup
+            if lineup != previous:
+                changed_lineups.append(lineup)
+            if is_frozen(lineup, match_rows[match_id]["status"]):
+                lineup_candidates.discard(match_id)
+
+    # Une seule écriture SQLite par cycle, limitée aux lineups qui ont changé
+    if storage is not None and changed_lineups:
+        storage.write_cycle(lineups=changed_lineups)
+
+    # Mémoire bornée : les lineups des matchs retirés sont oubliés avec eux ; au-delà de la limite,
+    # les plus anciens des lineups qui ne sont plus affichés (match revenu à "notstarted").
+    # Un lineup affiché n'est jamais oublié : il serait redemandé, puis oublié, à chaque cycle.
+    excess = len(lineup_cache) - MAX_CACHED_LINEUPS
+    if excess > 0:
+        hidden = [match_id for match_id in lineup_cache if match_rows.get(match_id, {}).get("status", "notstarted") == "notstarted"]
+        for match_id in hidden[:excess]:
+            del lineup_cache[match_id]
+
+    # Ni transition ni lineup modifié : le snapshot publié est toujours à jour
+    if not changes and not changed_lineups and classements_store.data() is not None:
+        return
+
+    # Résultats par statut, avec le lineup des matchs en cours et terminés (jointure par id)
     results = {"ongoing": [], "finished": [], "not_started": []}
+    categories = {"inprogress": results["ongoing"], "finished": results["finished"], "notstarted": results["not_started"]}
+    for match_id, row in match_rows.items():
+        match_lineup = lineup_cache.get(match_id) if row["status"] != "notstarted" else None
+        categories[row["status"]].append(dict(row, lineup=match_lineup) if match_lineup else row)
+
+    # Publier les résultats (classements.json n'est plus qu'un point de sauvegarde) ;
+    # sérialisation et point de sauvegarde hors de la boucle asyncio
+    await asyncio.to_thread(classements_store.publish, results)
+
+    logging.info(f"Les données des matchs ont été publiées ({len(to_fetch)} lineup(s) demandé(s), {len(lineup_cache)} en cache).")
+
+# Boucle infinie de 3 secondes
+async def process_matches(store):
+    cycle_timer = LoopTimer("classements", 3)
+    while True:
+        with cycle_timer:
+            await refresh_matches(store)
+
+        # Attendre 3 secondes avant de répéter la boucle
+        await asyncio.sleep(3)
+
+# État conservé d'un redémarrage à l'autre (voir state_checkpoint.py) : les lineups
+# figés ne sont pas redemandés après un redémarrage
+def dump_state():
+    return {"lineup_cache": dict(lineup_cache)}
+
+def restore_state(state):
+    for match_id, lineup in state["lineup_cache"].items():
+        lineup_cache.setdefault(match_id, lineup)
 
-    # Créer une session aiohttp pour les requêtes
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-
-        # Boucle infinie de 3 secondes
-        while True:
-            # Parcourir les matchs et créer des tâches selon leur statut
-            for match in data.get("matches", []):
-                match_id = match["id"]
-                match_status = match["status"]
-
-                # Préparer les données selon le statut
-                if match_status in ["inprogress", "finished", "notstarted"]:
-                    match_data = {
-                        "id": match_id,
-                        "homeTeam": match["homeTeam"],
-                        "awayTeam": match["awayTeam"],
-                        "startTime": match.get("startTime"),
-                        "status": match_status
-                    }
-
-                    if match_status in ["inprogress", "finished"]:
-                        results[match_status].append(match_data)
-                        tasks.append(get_lineup_data(session, match_id))
-                    elif match_status == "notstarted":
-                        results["not_started"].append(match_data)
-
-            # Attendre les résultats des tâches
-            lineups = await asyncio.gather(*tasks, return_exceptions=True)
-            lineups = [lineup for lineup in lineups if lineup]  # Supprimer les erreurs et résultats nuls
-
-            # Associer les données de lineup aux matchs correspondants
-            for match_list in [results["ongoing"], results["finished"]]:
-                for match in match_list:
-                    match_lineup = next((lineup for lineup in lineups if lineup["matchId"] == match["id"]), None)
-                    if match_lineup:
-                        match["lineup"] = match_lineup
-
-            # Enregistrer les résultats dans classements.json
-            with open("classements.json", "w", encoding="utf-8") as file:
-                json.dump(results, file, ensure_ascii=False, indent=4)
-
-            logging.info("Les données des matchs ont été enregistrées dans classements.json.")
-
-            # Attendre 3 secondes avant de répéter la boucle
-            await asyncio.sleep(3)
-
-# Route Flask pour afficher les résultats
-@app.route('/results', methods=['GET'])
-async def get_results():
-    with open('classements.json', 'r', encoding='utf-8') as file:
-        results = json.load(file)
-    return jsonify(results)
+# Route pour afficher les matchs avec leurs lineups
+@routes.get('/lineups')
+async def get_results(request):
+    return snapshot_response(request, classements_store.current())
 
 # Fonction principale
 async def main():
-    file_path = "foot.json"  # Chemin du fichier local
-    await process_matches(file_path)
+    await process_matches(foot_store)
 
-# Exécuter l'application Flask
+# Lancer uniquement ce module (routes et boucle) dans le serveur commun
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=10000)
-    asyncio.run(main())
+    import server
+    server.main(["classements"])
@@ -0,0 +1,138 @@
+import time
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from circuit import breakers
+from metrics import upstream_duration, upstream_responses, upstream_bytes
+
+# Client HTTP partagé par les pollers par match (cotes, incidents, lineups).
+# Une seule session aiohttp longue durée : connexions TCP/TLS conservées (keep-alive),
+# cache DNS, nombre de connexions limité par hôte, sémaphore de concurrence et timeouts.
+
+# Nombre total de connexions ouvertes simultanément
+MAX_CONNECTIONS = 100
+
+# Nombre de connexions simultanées vers un même hôte
+MAX_CONNECTIONS_PER_HOST = 30
+
+# Nombre maximal de requêtes en cours (au-delà, les requêtes attendent leur tour)
+MAX_CONCURRENT_REQUESTS = 50
+
+# Timeouts (en secondes)
+REQUEST_TIMEOUT = 10
+CONNECT_TIMEOUT = 5
+
+# Durée de conservation des connexions inactives et du cache DNS (en secondes)
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+
+class PooledClient:
+    def __init__(self, limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                 concurrency=MAX_CONCURRENT_REQUESTS, timeout=REQUEST_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+        # Statistiques du pool
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    # Créer la session au premier appel (elle est liée à la boucle asyncio courante)
+    def _ensure_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            trace_config.on_response_chunk_received.append(self._on_chunk_received)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=CONNECT_TIMEOUT),
+                trace_configs=[trace_config]
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._session
+
+    async def _on_connection_created(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.connections_reused += 1
+
+    # Octets reçus, attribués à l'endpoint transmis dans trace_request_ctx
+    async def _on_chunk_received(self, session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx.inc(len(params.chunk))
+
+    # Requête GET bornée par le sémaphore ; s'utilise comme session.get().
+    # `endpoint` (voir metrics.UPSTREAM_ENDPOINTS) étiquette les métriques amont et
+    # alimente le disjoncteur de l'endpoint (circuit.breakers).
+    @asynccontextmanager
+    async def get(self, url, endpoint=None, **kwargs):
+        session = self._ensure_session()
+        if endpoint is not None:
+            kwargs["trace_request_ctx"] = upstream_bytes.labels(endpoint)
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            waited = time.perf_counter() - queued_at
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+            self.requests += 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with session.get(url, **kwargs) as response:
+                    status = response.status
+                    if endpoint is not None:
+                        upstream_duration.labels(endpoint).observe(time.perf_counter() - started)
+                        breakers[endpoint].record_response(status, response.headers.get("Retry-After"))
+                    yield response
+            except Exception:
+                self.errors += 1
+                # Erreur réseau ou timeout avant toute réponse
+                if endpoint is not None and status == "error":
+                    breakers[endpoint].record_failure()
+                raise
+            finally:
+                self.in_flight -= 1
+                if endpoint is not None:
+                    upstream_responses.labels(endpoint, status).inc()
+
+    # Statistiques du pool de connexions
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "queue_wait_avg": self.queue_wait_total / self.requests if self.requests else 0.0,
+            "queue_wait_max": self.queue_wait_max
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Client partagé par tous les modules du processus
+client = PooledClient()
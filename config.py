@@ -0,0 +1,27 @@
+import os
+
+# URL de base de l'API SofaScore (surchargeable, par exemple pour pointer vers le serveur
+# de test local de benchmarks/mock_upstream.py)
+API_BASE = os.environ.get("SOFASCORE_API_BASE", "https://www.sofascore.com/api/v1").rstrip("/")
+
+# Budget global de requêtes amont par seconde et taille du seau (rafale) ; le seau vaut
+# par défaut une seconde de budget. 150 req/s couvrent cotes et incidents de 60 matchs
+# en cours à la seconde, avec un surplus pour les matchs à venir et les lineups.
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("MAX_REQUESTS_PER_SECOND", 150))
+REQUEST_BURST = float(os.environ.get("REQUEST_BURST", 0)) or None
+
+# Chemin de la base SQLite optionnelle (stockage désactivé si la variable n'est pas définie)
+SQLITE_PATH = os.environ.get("SQLITE_PATH") or None
+
+# Nombre de processus pour les requêtes par match (0 : tout dans le processus principal)
+POLL_SHARDS = int(os.environ.get("POLL_SHARDS", 0))
+
+# Journal de capture des réponses amont (capture désactivée si la variable n'est pas définie)
+CAPTURE_PATH = os.environ.get("CAPTURE_PATH") or None
+
+# Point de reprise de l'état en mémoire (caches, historiques, séquences) ; vide pour le désactiver
+STATE_PATH = os.environ.get("STATE_PATH", os.path.join("cache", "state.pickle")) or None
+
+# Âge maximal (en secondes) d'un point de reprise ou d'un snapshot JSON relu au démarrage ;
+# au-delà, il est ignoré plutôt que servi comme données courantes
+MAX_STATE_AGE = int(os.environ.get("MAX_STATE_AGE", 6 * 3600))
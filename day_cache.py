@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import logging
+import threading
+from snapshot import Snapshot
+
+# Cache des matchs par jour pour les requêtes sur d'autres dates que celle du jour.
+# Un jour passé dont tous les matchs sont terminés ne change plus : il est écrit une fois
+# sur le disque (un fichier par date) et n'est plus jamais redemandé à l'API, même après
+# un redémarrage. Les autres jours (à venir, ou passés mais incomplets) sont gardés en
+# mémoire pendant DAY_TTL secondes. Chaque jour est conservé sous forme de Snapshot,
+# sérialisé une seule fois pour toutes les réponses.
+
+# Répertoire des jours figés
+DAY_CACHE_DIR = os.path.join("cache", "days")
+
+# Durée de validité (en secondes) d'un jour qui peut encore changer
+DAY_TTL = 300
+
+# Nombre maximal de jours gardés en mémoire
+MAX_MEMORY_DAYS = 60
+
+
+# Un jour est figé lorsqu'il est passé et que tous ses matchs sont terminés
+def is_complete(day, today, data):
+    return day < today and bool(data.get("finished")) and not data.get("ongoing") and not data.get("upcoming")
+
+
+class DayCache:
+    def __init__(self, directory=DAY_CACHE_DIR, ttl=DAY_TTL, max_entries=MAX_MEMORY_DAYS):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # date -> (expiration, Snapshot) ; expiration None pour un jour figé
+        self._memory = {}
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{day}.json")
+
+    def _remember(self, day, expires_at, snapshot):
+        with self._lock:
+            self._memory.pop(day, None)
+            self._memory[day] = (expires_at, snapshot)
+            while len(self._memory) > self.max_entries:
+                del self._memory[next(iter(self._memory))]
+
+    # Snapshot d'un jour s'il est en cache et encore valide (None sinon)
+    def get(self, day, today):
+        entry = self._memory.get(day)
+        if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+            return entry[1]
+        if day >= today:
+            return None
+
+        try:
+            with open(self._path(day), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Erreur lors de la lecture du cache du {day}: {e}")
+            return None
+        snapshot = Snapshot(0, os.path.getmtime(self._path(day)), data, "days")
+        self._remember(day, None, snapshot)
+        return snapshot
+
+    # Mémoriser les données d'un jour ; un jour complet est écrit sur le disque (atomiquement)
+    def put(self, day, today, data):
+        snapshot = Snapshot(0, time.time(), data, "days")
+        if not is_complete(day, today, data):
+            self._remember(day, time.monotonic() + self.ttl, snapshot)
+            return snapshot
+
+        path = self._path(day)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(snapshot.encoded().body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Erreur lors de l'écriture du cache du {day}: {e}")
+            self._remember(day, time.monotonic() + self.ttl, snapshot)
+            return snapshot
+        self._remember(day, None, snapshot)
+        return snapshot
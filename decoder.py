@@ -0,0 +1,201 @@
+import codecs
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+from entities import team_name, tournament_name
+
+# Décodage incrémental de la réponse "scheduled-events".
+# Le tableau "events" est lu un événement à la fois (json.JSONDecoder.raw_decode sur un
+# tampon glissant) au lieu de construire l'arbre complet de la réponse, et seuls les champs
+# utilisés sont conservés dans des enregistrements Match compacts (__slots__).
+
+# Taille des blocs lus sur le réseau
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+# Caractères qui peuvent prolonger un nombre JSON ("1." ou "1e" coupés en fin de bloc)
+_NUMBER_CONTINUATION = ".eE+-0123456789"
+
+
+# Formatage des timestamps mis en cache (de nombreux matchs partagent la même heure)
+@lru_cache(maxsize=8192)
+def format_timestamp(timestamp):
+    if not timestamp:
+        return "Unknown"
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Enregistrement compact d'un match, utilisable comme un dictionnaire en lecture
+class Match(Mapping):
+    __slots__ = ("homeTeam", "awayTeam", "startTime", "id", "seasonId", "homeScore",
+                 "awayScore", "status", "tournament", "endTime", "currentTime")
+
+    # Champs exportés, dans l'ordre historique de foot.json
+    FIELDS = ("homeTeam", "awayTeam", "startTime", "id", "seasonId", "homeScore",
+              "awayScore", "status", "tournament")
+
+    def __init__(self, homeTeam, awayTeam, startTime, id, seasonId, homeScore, awayScore,
+                 status, tournament, endTime=None, currentTime=None):
+        self.homeTeam = homeTeam
+        self.awayTeam = awayTeam
+        self.startTime = startTime
+        self.id = id
+        self.seasonId = seasonId
+        self.homeScore = homeScore
+        self.awayScore = awayScore
+        self.status = status
+        self.tournament = tournament
+        self.endTime = endTime
+        self.currentTime = currentTime
+
+    def _keys(self):
+        if self.status == "finished":
+            return self.FIELDS + ("endTime",)
+        if self.status == "inprogress":
+            return self.FIELDS + ("currentTime",)
+        return self.FIELDS
+
+    def __getitem__(self, key):
+        if key not in self._keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self._keys()}
+
+    def __repr__(self):
+        return f"Match({self.to_dict()!r})"
+
+
+# Construire un Match à partir d'un événement brut de l'API
+def match_from_event(event):
+    home_team = event.get("homeTeam") or {}
+    away_team = event.get("awayTeam") or {}
+    status = (event.get("status") or {}).get("type", "Unknown")
+    last_updated = event.get("lastUpdatedTimestamp")
+
+    return Match(
+        homeTeam=team_name(home_team),
+        awayTeam=team_name(away_team),
+        startTime=format_timestamp(event.get("startTimestamp")),
+        id=event.get("id", "Unknown"),
+        seasonId=(event.get("season") or {}).get("id", "Unknown"),
+        homeScore=(event.get("homeScore") or {}).get("display", 0),
+        awayScore=(event.get("awayScore") or {}).get("display", 0),
+        status=status,
+        tournament=tournament_name(event.get("tournament")),
+        endTime=format_timestamp(last_updated) if status == "finished" else None,
+        currentTime=format_timestamp(last_updated) if status == "inprogress" else None
+    )
+
+
+# Tampon de texte alimenté bloc par bloc ; la partie déjà lue est régulièrement libérée
+class _StreamBuffer:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    # Lire le bloc suivant ; renvoie False quand le flux est terminé
+    def more(self):
+        if self.exhausted:
+            return False
+        # Libérer le texte déjà consommé
+        if self.pos:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._utf8.decode(chunk)
+                return True
+        self.text += self._utf8.decode(b"", final=True)
+        self.exhausted = True
+        return False
+
+    # Avancer jusqu'au prochain caractère significatif et le renvoyer ("" en fin de flux)
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def _number_continues(self, value, end):
+        return (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and self.text[end] in _NUMBER_CONTINUATION)
+
+    # Décoder une valeur JSON complète à la position courante
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # Une valeur qui touche la fin du tampon peut être tronquée (nombre, littéral),
+                # de même qu'un nombre suivi d'un caractère qui pourrait le prolonger
+                if self.exhausted or (end < len(self.text) and not self._number_continues(value, end)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            if not self.more():
+                value, self.pos = _decoder.raw_decode(self.text, self.pos)
+                return value
+
+
+# Itérer sur les événements bruts du tableau "events", un objet à la fois
+def iter_events(chunks):
+    buffer = _StreamBuffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        key = buffer.value()
+        buffer.expect(":")
+        if key == "events":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    separator = buffer.peek()
+                    buffer.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"Unexpected '{separator}' in events array")
+        else:
+            # Clé non utilisée : valeur décodée puis ignorée
+            buffer.value()
+
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"Unexpected '{separator}' in response object")
+
+
+# Découper un contenu déjà en mémoire en blocs (pour les contenus non lus en flux)
+def iter_chunks(content, size=CHUNK_SIZE):
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
@@ -0,0 +1,83 @@
+import re
+import sys
+import threading
+import unicodedata
+from functools import lru_cache
+
+# Registre des entités (équipes, tournois, joueurs) indexé par id.
+# Le nom d'une entité n'est normalisé qu'une fois : tant que l'API renvoie la même valeur
+# brute pour un id, le registre renvoie le même objet (chaîne internée ou dictionnaire),
+# partagé par tous les matchs, incidents et lineups des snapshots successifs.
+
+# Nombre maximal d'entrées par registre (les moins récemment ajoutées sont oubliées)
+MAX_TEAMS = 20000
+MAX_TOURNAMENTS = 5000
+MAX_PLAYERS = 50000
+
+# Séquences \uXXXX restées littérales dans une chaîne
+_ESCAPED_UNICODE = re.compile(r"\\u([0-9a-fA-F]{4})")
+
+
+# Normaliser un nom : séquences \uXXXX littérales décodées, forme Unicode NFC, chaîne internée.
+# (L'ancien encode('utf-8').decode('unicode_escape') transformait "Bačka" en "BaÄ\x8dka".)
+@lru_cache(maxsize=65536)
+def normalize_name(name):
+    if not isinstance(name, str):
+        return name
+    if "\\u" in name:
+        name = _ESCAPED_UNICODE.sub(lambda match: chr(int(match.group(1), 16)), name)
+    return sys.intern(unicodedata.normalize("NFC", name))
+
+
+class EntityRegistry:
+    def __init__(self, build, max_entries):
+        self.build = build
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # id -> (valeur brute de l'API, objet partagé)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Objet partagé de l'entité `entity_id` ; reconstruit seulement si la valeur brute a changé
+    def get(self, entity_id, raw):
+        entry = self._entries.get(entity_id)
+        if entry is not None and entry[0] == raw:
+            return entry[1]
+        value = self.build(raw)
+        if entity_id is None:
+            return value
+        with self._lock:
+            self._entries.pop(entity_id, None)
+            self._entries[entity_id] = (raw, value)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return value
+
+
+teams = EntityRegistry(normalize_name, MAX_TEAMS)
+tournaments = EntityRegistry(normalize_name, MAX_TOURNAMENTS)
+players = EntityRegistry(normalize_name, MAX_PLAYERS)
+
+
+# Nom partagé d'une entité de l'API ({"id": ..., "name": ...}) ; `default` si elle est absente
+def _entity_name(registry, entity, default):
+    if not entity:
+        return default
+    name = entity.get("name")
+    if name is None:
+        return default
+    return registry.get(entity.get("id"), name)
+
+
+def team_name(team, default="Unknown"):
+    return _entity_name(teams, team, default)
+
+
+def tournament_name(tournament, default="Unknown"):
+    return _entity_name(tournaments, tournament, default)
+
+
+def player_name(player, default=None):
+    return _entity_name(players, player, default)
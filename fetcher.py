@@ -0,0 +1,76 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Couche de récupération « single-flight » :
+# les appelants concurrents pour une même URL partagent une seule requête en cours
+# et un seul résultat parsé. Un résultat récent (moins de refresh_interval secondes)
+# est resservi tel quel, et les requêtes s'exécutent dans un pool de threads borné.
+
+
+class SingleFlightFetcher:
+    def __init__(self, max_workers=5, refresh_interval=2):
+        self.refresh_interval = refresh_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetcher")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = {}
+        self.requests = 0
+        self.deduplicated = 0
+        self.cached = 0
+
+    # Lancer (ou rejoindre) la récupération de `key` ; renvoie un Future partagé
+    def fetch(self, key, func, *args):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.refresh_interval:
+                self.cached += 1
+                future = Future()
+                future.set_result(cached[1])
+                return future
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+
+            future = self._executor.submit(self._run, key, func, *args)
+            self._inflight[key] = future
+            self.requests += 1
+            return future
+
+    # Version bloquante de fetch()
+    def get(self, key, func, *args):
+        return self.fetch(key, func, *args).result()
+
+    # Exécuter la requête puis libérer la place « en cours » et mémoriser le résultat
+    def _run(self, key, func, *args):
+        result = None
+        try:
+            result = func(*args)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if result is not None:
+                    self._results[key] = (time.monotonic(), result)
+                else:
+                    self._results.pop(key, None)
+
+    # Oublier le dernier résultat de `key` (données conservées ailleurs)
+    def forget(self, key):
+        with self._lock:
+            self._results.pop(key, None)
+
+    # Statistiques de la couche de récupération
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "deduplicated": self.deduplicated,
+                "cached": self.cached,
+                "inflight": len(self._inflight)
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,26 +1,219 @@
 import os
-import requests
-import json
+import hashlib
 import time
-import threading
-from datetime import datetime
-from flask import Flask, jsonify
-import threading
+import asyncio
+from datetime import date, datetime, timedelta
+from aiohttp import web
+from config import API_BASE
+from snapshot import Snapshot, foot_store
+from responses import json_error, query_date, query_number, snapshot_response
+from fetcher import SingleFlightFetcher
+from day_cache import DayCache
+from storage import storage
+from results_index import (DEFAULT_LIMIT, FIELDS, MAX_LIMIT, decode_cursor, index_for,
+                           parse_kickoff, project)
+from decoder import CHUNK_SIZE, iter_events, match_from_event
+from circuit import breakers
+from scheduler import PRIORITY_DAY_FETCHES, PRIORITY_SCHEDULED_EVENTS, request_budget
+from capture import recorder
+from match_events import channel as match_events
+from metrics import LoopTimer, upstream_duration, upstream_responses, upstream_bytes
 
-# Nombre de threads à utiliser pour effectuer les requêtes en parallèle
+# Nombre maximal de threads du pool de récupération
 NUM_THREADS = 5
 
-# Créer une instance Flask
-app = Flask(__name__)
+# Nombre maximal de threads du pool des autres jours (requêtes /results?date=, backfill)
+DAY_FETCH_THREADS = 3
+
+# Intervalle (en secondes) entre deux rafraîchissements des matchs du jour
+REFRESH_INTERVAL = 2
+
+# Nombre maximal de jours pour une requête /results?from=&to=
+MAX_RANGE_DAYS = 31
+
+# Écart maximal (en jours) entre aujourd'hui et un jour demandé par /results?date= ou ?from=&to=
+MAX_DAYS_FROM_TODAY = int(os.environ.get("MAX_DAYS_FROM_TODAY", 60))
+
+# Nombre de jours passés rechargés au démarrage (0 pour désactiver)
+BACKFILL_DAYS = int(os.environ.get("BACKFILL_DAYS", 7))
+
+# Routes HTTP du module (servies par server.py)
+routes = web.RouteTableDef()
+
+# Couche de récupération partagée : un seul appel en cours par URL
+fetcher = SingleFlightFetcher(max_workers=NUM_THREADS, refresh_interval=REFRESH_INTERVAL)
+
+# Pool séparé pour les autres jours : une plage de 31 jours ou le backfill ne passent
+# jamais devant le rafraîchissement du jour courant
+day_fetcher = SingleFlightFetcher(max_workers=DAY_FETCH_THREADS, refresh_interval=REFRESH_INTERVAL)
+
+# Métriques de la boucle
+cycle_timer = LoopTimer("foot", REFRESH_INTERVAL)
+
+# Matchs des autres jours (passés figés sur le disque, à venir avec TTL)
+day_cache = DayCache()
+
+# Les pollers du processus suivent les publications de la boucle, pas le point de sauvegarde
+match_events.local_source = True
+
+# Construire l'URL de l'API pour une date "YYYY-MM-DD"
+def scheduled_events_url(day):
+    return f"{API_BASE}/sport/football/scheduled-events/{day}"
+
+# URL du jour rafraîchie par la boucle
+live_url = None
 
 def fetch_football_data():
+    global live_url
+
+    # Obtenir la date du jour au format "YYYY-MM-DD"
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    # Construire l'URL de l'API avec la date du jour
+    api_url = scheduled_events_url(today)
+
+    # Changement de jour : l'état de rafraîchissement et le dernier résultat de la veille
+    # sont oubliés (les autres jours sont servis par le cache par date)
+    if api_url != live_url:
+        if live_url is not None:
+            refresh_state.pop(live_url, None)
+            fetcher.forget(live_url)
+        live_url = api_url
+
+    # Les appelants concurrents partagent la même requête et le même résultat
+    return fetcher.get(api_url, download_football_data, api_url)
+
+# Récupérer plusieurs jours en parallèle dans le pool borné des autres jours.
+# Renvoie {date: Snapshot} (None pour un jour indisponible) ; le jour courant est
+# servi par le snapshot de la boucle, les autres par le cache par date. Les requêtes
+# des autres jours ont leur propre pool, leur propre disjoncteur et la priorité la plus
+# basse du budget : elles ne peuvent ni suspendre ni retarder le rafraîchissement du jour courant.
+async def fetch_days(days):
+    today = datetime.now().strftime("%Y-%m-%d")
+    snapshots = {}
+    pending = {}
+    for day in days:
+        # Lecture du cache par date (fichier d'un jour figé) hors de la boucle asyncio
+        snapshot = foot_store.current() if day == today else await asyncio.to_thread(day_cache.get, day, today)
+        if snapshot is not None:
+            snapshots[day] = snapshot
+        else:
+            api_url = scheduled_events_url(day)
+            if day == today:
+                # Jour courant pas encore publié : requête partagée avec la boucle
+                future = fetcher.fetch(api_url, download_football_data, api_url)
+            else:
+                future = day_fetcher.fetch(
+                    api_url, download_football_data, api_url, "scheduled-events-days", PRIORITY_DAY_FETCHES
+                )
+            pending[day] = (api_url, future)
+
+    for day, (api_url, future) in pending.items():
+        data = await asyncio.wrap_future(future)
+        if day != today:
+            # Les autres jours n'ont pas besoin de l'état de revalidation : le cache par date le remplace
+            refresh_state.pop(api_url, None)
+            day_fetcher.forget(api_url)
+        snapshots[day] = await asyncio.to_thread(store_day, day, today, data) if data else None
+    return snapshots
+
+# Mettre en cache un jour récupéré (sérialisation et écriture d'un jour figé) et l'écrire
+# dans SQLite ; appelé dans un thread, hors de la boucle asyncio
+def store_day(day, today, data):
+    snapshot = day_cache.put(day, today, data)
+    if storage is not None:
+        storage.write_cycle(matches=all_matches(data))
+    return snapshot
+
+# Recharger les jours passés (au démarrage) ; les jours déjà figés sur le disque ne sont pas redemandés
+async def backfill(days_back):
+    today = datetime.now()
+    days = [(today - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days_back, 0, -1)]
+    try:
+        snapshots = await fetch_days(days)
+    except Exception as e:
+        print(f"Backfill failed: {e}")
+        return
+    missing = [day for day, snapshot in snapshots.items() if snapshot is None]
+    print(f"Backfill: {len(days) - len(missing)}/{len(days)} days loaded" + (f", missing {missing}" if missing else ""))
+
+# État de rafraîchissement par URL : validateurs HTTP, empreinte du contenu,
+# matchs déjà normalisés (indexés par id) et dernières données structurées
+refresh_state = {}
+
+# Clé de changement d'un événement : lastUpdatedTimestamp quand il est fourni,
+# sinon les champs qui évoluent pendant la journée
+def event_change_key(event):
+    last_updated = event.get("lastUpdatedTimestamp")
+    if last_updated:
+        return last_updated
+    return (
+        event.get("status", {}).get("type"),
+        event.get("homeScore", {}).get("display"),
+        event.get("awayScore", {}).get("display"),
+        event.get("startTimestamp")
+    )
+
+# Fonction pour structurer les matchs d'une réponse (octets bruts, bloc par bloc).
+# `state` conserve les matchs déjà normalisés par id ; renvoie l'objet précédent
+# (même identité) lorsque aucun match n'a changé.
+def structure_football_data(state, chunks):
+    # Décoder les événements un par un, sans construire la réponse complète
+    events = iter_events(chunks)
+
+    # Ne re-normaliser que les événements nouveaux ou modifiés (diff par id)
+    previous_events = state["events"]
+    current_events = {}
+    changed = False
+
+    # Trier et structurer les données
+    structured_data = {
+        "finished": [],
+        "ongoing": [],
+        "upcoming": []
+    }
+
+    for event in events:
+        event_id = event.get("id", "Unknown")
+        change_key = event_change_key(event)
+        cached = previous_events.get(event_id)
+        if cached is not None and cached[0] == change_key:
+            match = cached[1]
+        else:
+            match = match_from_event(event)
+            changed = True
+        current_events[event_id] = (change_key, match)
+
+        if match["status"] == "finished":
+            structured_data["finished"].append(match)
+        elif match["status"] == "inprogress":
+            structured_data["ongoing"].append(match)
+        elif match["status"] == "notstarted":
+            structured_data["upcoming"].append(match)
+
+    # Contenu différent mais matchs identiques : conserver le snapshot précédent.
+    # Les données sont remplacées avant les matchs normalisés : une copie prise entre les deux
+    # (point de reprise) ne peut associer des matchs récents à des données plus anciennes.
+    if changed or state["data"] is None or len(current_events) != len(previous_events):
+        state["data"] = structured_data
+    state["events"] = current_events
+    return state["data"]
+
+# Fonction pour télécharger et structurer les matchs d'une URL donnée.
+# Renvoie l'objet précédent (même identité) lorsque rien n'a changé.
+# `endpoint` choisit le disjoncteur et les métriques amont, `priority` la classe du budget.
+def download_football_data(api_url, endpoint="scheduled-events", priority=PRIORITY_SCHEDULED_EVENTS):
+    # Import différé : requests n'est chargé qu'au premier téléchargement, pas au démarrage
+    import requests
+
+    state = refresh_state.setdefault(api_url, {"etag": None, "last_modified": None, "hash": None, "events": {}, "data": None})
+    breaker = breakers[endpoint]
+
+    # Endpoint suspendu (backoff, circuit ouvert) ou budget épuisé : garder les dernières données
+    if not breaker.allow() or not request_budget.try_acquire(priority):
+        return state["data"]
+
     try:
-        # Obtenir la date du jour au format "YYYY-MM-DD"
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        # Construire l'URL de l'API avec la date du jour
-        api_url = f"https://www.sofascore.com/api/v1/sport/football/scheduled-events/{today}"
-        
         # Configuration des en-têtes pour contourner les restrictions
         headers = {
             'accept': '*/*',
@@ -31,43 +224,54 @@ def fetch_football_data():
             'user-agent': 'Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1'
         }
 
-        # Envoyer une requête GET à l'API
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()  # Lever une exception en cas d'erreur HTTP
-        
-        # Traiter la réponse JSON
-        events = response.json().get("events", [])
-        
-        # Trier et structurer les données
-        structured_data = {
-            "finished": [],
-            "ongoing": [],
-            "upcoming": []
-        }
+        # Revalidation conditionnelle quand l'API fournit ETag / Last-Modified
+        if state["data"] is not None:
+            if state["etag"]:
+                headers['if-none-match'] = state["etag"]
+            if state["last_modified"]:
+                headers['if-modified-since'] = state["last_modified"]
+
+        # Envoyer une requête GET à l'API (corps lu en flux, bloc par bloc)
+        started = time.perf_counter()
+        try:
+            response = requests.get(api_url, headers=headers, stream=True)
+        except requests.exceptions.RequestException:
+            upstream_responses.labels(endpoint, "error").inc()
+            breaker.record_failure()
+            raise
+        upstream_duration.labels(endpoint).observe(time.perf_counter() - started)
+        upstream_responses.labels(endpoint, response.status_code).inc()
+        breaker.record_response(response.status_code, response.headers.get("Retry-After"))
+        with response:
+            if response.status_code == 304 and state["data"] is not None:
+                if recorder is not None:
+                    recorder.record("scheduled-events", None, 304, b"", api_url)
+                return state["data"]
+            response.raise_for_status()  # Lever une exception en cas d'erreur HTTP
+
+            state["etag"] = response.headers.get("ETag")
+            state["last_modified"] = response.headers.get("Last-Modified")
+
+            # Empreinte calculée au fil des blocs ; les octets bruts sont conservés
+            # (bien plus compacts que l'arbre JSON) pour le décodage incrémental
+            hasher = hashlib.sha1()
+            chunks = []
+            upstream_received = upstream_bytes.labels(endpoint)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                hasher.update(chunk)
+                chunks.append(chunk)
+                upstream_received.inc(len(chunk))
 
-        for event in events:
-            match = {
-                "homeTeam": event.get("homeTeam", {}).get("name", "Unknown"),
-                "awayTeam": event.get("awayTeam", {}).get("name", "Unknown"),
-                "startTime": datetime.fromtimestamp(event.get("startTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("startTimestamp") else "Unknown",
-                "id": event.get("id", "Unknown"),
-                "seasonId": event.get("season", {}).get("id", "Unknown"),  # Récupérer l'id de la saison
-                "homeScore": event.get("homeScore", {}).get("display", 0),
-                "awayScore": event.get("awayScore", {}).get("display", 0),
-                "status": event.get("status", {}).get("type", "Unknown"),
-                "tournament": event.get("tournament", {}).get("name", "Unknown")  # Ajouter le nom du championnat ici
-            }
-            
-            # Ajouter des heures spécifiques en fonction du statut
-            if match["status"] == "finished":
-                match["endTime"] = datetime.fromtimestamp(event.get("lastUpdatedTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("lastUpdatedTimestamp") else "Unknown"
-                structured_data["finished"].append(match)
-            elif match["status"] == "inprogress":
-                match["currentTime"] = datetime.fromtimestamp(event.get("lastUpdatedTimestamp", 0)).strftime("%Y-%m-%d %H:%M:%S") if event.get("lastUpdatedTimestamp") else "Unknown"
-                structured_data["ongoing"].append(match)
-            elif match["status"] == "notstarted":
-                structured_data["upcoming"].append(match)
+        if recorder is not None:
+            recorder.record("scheduled-events", None, response.status_code, b"".join(chunks), api_url)
 
+        # Sans validateurs, comparer l'empreinte du contenu avant tout parsing
+        content_hash = hasher.hexdigest()
+        if content_hash == state["hash"] and state["data"] is not None:
+            return state["data"]
+
+        structured_data = structure_football_data(state, chunks)
+        state["hash"] = content_hash
         return structured_data
 
     except requests.exceptions.RequestException as e:
@@ -77,61 +281,172 @@ def fetch_football_data():
         print(f"An unexpected error occurred: {e}")
         return None
 
-# Fonction pour gérer la récupération et l'écriture des données
+# État conservé d'un redémarrage à l'autre (voir state_checkpoint.py) : données structurées et
+# matchs déjà normalisés du jour courant, si bien que le premier cycle après un redémarrage ne
+# re-normalise que les matchs modifiés. Les validateurs HTTP et l'empreinte, écrits par les threads
+# du fetcher avant les données, ne sont pas conservés : le premier téléchargement est complet.
+# L'état d'un autre jour (redémarrage après minuit) n'est pas repris.
+def dump_state():
+    api_url = live_url
+    state = refresh_state.get(api_url) if api_url is not None else None
+    if state is None:
+        return {"refresh_state": {}}
+    return {
+        "refresh_state": {
+            api_url: {"etag": None, "last_modified": None, "hash": None, "events": state["events"], "data": state["data"]}
+        }
+    }
+
+def restore_state(state):
+    api_url = scheduled_events_url(datetime.now().strftime("%Y-%m-%d"))
+    url_state = state["refresh_state"].get(api_url)
+    if url_state is not None:
+        refresh_state.setdefault(api_url, url_state)
+
+# Tous les matchs d'un jour structuré, toutes catégories confondues
+def all_matches(data):
+    return data.get("finished", []) + data.get("ongoing", []) + data.get("upcoming", [])
+
+# Fonction pour gérer la récupération et la publication des données
 def save_football_data():
     data = fetch_football_data()
+    previous = foot_store.data()
+    if data and data is previous:
+        # Rien n'a changé : pas de nouvelle publication ni de nouvelle sérialisation
+        return
     if data:
-        # Sauvegarder les données dans un fichier JSON appelé 'foot.json'
-        output_file = "foot.json"
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Data saved to {output_file}")
+        # Publier les données dans le magasin partagé ('foot.json' n'est plus qu'un point de sauvegarde)
+        snapshot = foot_store.publish(data)
+        print(f"Data published (version {snapshot.version})")
+
+        # Index secondaires construits ici (thread du pool) plutôt qu'à la première requête filtrée
+        index_for(snapshot)
+
+        # Écriture SQLite du cycle : seuls les matchs re-normalisés (nouveaux objets) sont écrits
+        if storage is not None:
+            unchanged = {id(match) for match in all_matches(previous)} if isinstance(previous, dict) else set()
+            storage.write_cycle(matches=[match for match in all_matches(data) if id(match) not in unchanged])
     else:
         print("No data received")
 
-# Route Flask pour afficher les résultats
-@app.route('/results', methods=['GET'])
-def get_results():
-    try:
-        # Lire le fichier 'foot.json' pour renvoyer les résultats
-        with open("foot.json", "r", encoding="utf-8") as f:
-            results = json.load(f)
-        return jsonify(results)
-    except FileNotFoundError:
-        return jsonify({"error": "Data not found"}), 404
-
-# Fonction pour lancer la boucle principale avec des threads
-def main_loop():
+# Paramètres de filtrage et de pagination de /results (None si aucun n'est fourni)
+FILTER_PARAMS = ("status", "tournament", "team", "season_id", "kickoff_from", "kickoff_to", "fields", "limit", "cursor")
+
+def parse_filters(request):
+    if not any(name in request.query for name in FILTER_PARAMS):
+        return None
+    filters = {
+        "status": request.query.get("status") or None,
+        "tournament": request.query.get("tournament") or None,
+        "team": request.query.get("team") or None,
+        "season_id": query_number(request, 'season_id'),
+        "limit": min(max(query_number(request, 'limit', DEFAULT_LIMIT), 1), MAX_LIMIT)
+    }
     try:
-        print("Starting the loop with multi-threading...")
+        for name in ("kickoff_from", "kickoff_to"):
+            value = request.query.get(name)
+            filters[name] = parse_kickoff(value) if value else None
+        cursor = request.query.get("cursor")
+        filters["cursor"] = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+    fields = request.query.get("fields")
+    filters["fields"] = fields.split(",") if fields else None
+    unknown = [field for field in filters["fields"] or () if field not in FIELDS]
+    if unknown:
+        raise web.HTTPBadRequest(text=f"Unknown fields: {', '.join(unknown)}")
+    return filters
+
+# Réponse filtrée et paginée à partir des index secondaires du snapshot
+def filtered_response(snapshot, filters, error_message="Data not found"):
+    if snapshot is None:
+        return json_error(error_message, 404)
+    fields = filters.pop("fields")
+    matches, next_cursor = index_for(snapshot).query(**filters)
+    return web.json_response({
+        "matches": [project(match, fields) for match in matches],
+        "next": next_cursor
+    })
+
+# Route pour afficher les résultats : le jour courant, un autre jour (?date=)
+# ou une plage de jours (?from=&to=, bornes incluses).
+# Filtres (jour courant ou ?date=) : status, tournament, team, season_id,
+# kickoff_from/kickoff_to (ISO), fields, limit et cursor (valeur "next" de la page précédente)
+@routes.get('/results')
+async def get_results(request):
+    day = query_date(request, 'date')
+    start = query_date(request, 'from')
+    end = query_date(request, 'to')
+    filters = parse_filters(request)
+
+    # Jours trop éloignés d'aujourd'hui : refusés avant toute requête amont
+    today = date.today()
+    for name, value in (('date', day), ('from', start), ('to', end)):
+        if value is not None and abs((value - today).days) > MAX_DAYS_FROM_TODAY:
+            raise web.HTTPBadRequest(text=f"Invalid date for '{name}': must be within {MAX_DAYS_FROM_TODAY} days of today")
+
+    # Servir le snapshot courant depuis ses octets pré-sérialisés
+    if day is None and start is None and end is None:
+        if filters is not None:
+            return filtered_response(foot_store.current(), filters)
+        return snapshot_response(request, foot_store.current())
 
-        # Liste pour stocker les threads
-        threads = []
+    if day is not None:
+        day = day.isoformat()
+        snapshots = await fetch_days([day])
+        if filters is not None:
+            return filtered_response(snapshots[day], filters, f"No data for {day}")
+        # Sérialisation hors de la boucle asyncio (jour relu du disque ou encore modifiable)
+        if snapshots[day] is not None:
+            await asyncio.to_thread(snapshots[day].encoded)
+        return snapshot_response(request, snapshots[day], f"No data for {day}")
 
+    if filters is not None:
+        raise web.HTTPBadRequest(text="Filters apply to a single day: use 'date' instead of 'from'/'to'")
+    if start is None or end is None:
+        raise web.HTTPBadRequest(text="Both 'from' and 'to' are required")
+    if end < start or (end - start).days >= MAX_RANGE_DAYS:
+        raise web.HTTPBadRequest(text=f"Invalid range: 'to' must follow 'from' by less than {MAX_RANGE_DAYS} days")
+
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    snapshots = await fetch_days(days)
+    snapshot = Snapshot(0, time.time(), {
+        "from": days[0],
+        "to": days[-1],
+        "days": {day: snapshot.data if snapshot is not None else None for day, snapshot in snapshots.items()}
+    }, "days")
+    # Sérialisation hors de la boucle asyncio (plusieurs jours de matchs)
+    await asyncio.to_thread(snapshot.encoded)
+    return snapshot_response(request, snapshot)
+
+# Boucle principale : la récupération (bloquante) s'exécute dans le pool du fetcher
+async def main():
+    print("Starting the refresh loop...")
+
+    # Rechargement des jours passés en arrière-plan, en parallèle de la boucle ; il s'arrête
+    # avec elle (un redémarrage par le superviseur le relance, les jours déjà figés sont ignorés)
+    backfill_task = asyncio.create_task(backfill(BACKFILL_DAYS)) if BACKFILL_DAYS > 0 else None
+
+    try:
         while True:
-            # Créer et démarrer plusieurs threads pour envoyer des requêtes en parallèle
-            for _ in range(NUM_THREADS):
-                thread = threading.Thread(target=save_football_data)
-                threads.append(thread)
-                thread.start()
+            # Une seule récupération par cycle, partagée avec les autres appelants éventuels
+            with cycle_timer:
+                await asyncio.to_thread(save_football_data)
 
-            # Attendre que tous les threads se terminent
-            for thread in threads:
-                thread.join()
+            # Diffuser aux pollers les transitions des matchs (coup d'envoi, score, fin...)
+            match_events.observe(foot_store.current())
 
-            # Attendre 2 secondes avant la prochaine requête
-            time.sleep(2)
+            stats = fetcher.stats()
+            print(f"Fetcher: {stats['requests']} requests, {stats['deduplicated']} deduplicated, {stats['cached']} served from cache")
 
-    except KeyboardInterrupt:
-        print("\nProcess interrupted by user. Exiting...")
-    except Exception as e:
-        print(f"Unexpected error in main loop: {e}")
+            # Attendre avant la prochaine requête
+            await asyncio.sleep(REFRESH_INTERVAL)
+    finally:
+        if backfill_task is not None:
+            backfill_task.cancel()
 
-# Lancer le serveur Flask et la boucle principale en parallèle
+# Lancer uniquement ce module (routes et boucle) dans le serveur commun
 if __name__ == "__main__":
-    # Lancer la boucle dans un thread
-    loop_thread = threading.Thread(target=main_loop)
-    loop_thread.start()
-
-    # Lancer Flask sur le port 10000 pour Render
-    app.run(host="0.0.0.0", port=10000)
+    import server
+    server.main(["foot"])
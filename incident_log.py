@@ -0,0 +1,96 @@
+import threading
+
+# Journal incrémental des incidents par match.
+# Chaque incident nouveau ou modifié reçoit un numéro de séquence croissant (global) ;
+# les clients ne demandent que les incidents postérieurs à la dernière séquence reçue.
+
+
+# Clé de déduplication d'un incident : son id et sa minute,
+# complétés par le type, l'équipe et le joueur quand l'API ne fournit pas d'id
+def incident_key(incident):
+    incident_id = incident.get("incidentId")
+    if incident_id is not None:
+        return (incident_id, incident.get("time"))
+    return (
+        incident.get("incidentType"),
+        incident.get("time"),
+        incident.get("team"),
+        incident.get("playerId") or incident.get("player") or incident.get("playerIn")
+    )
+
+
+class IncidentLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        # match_id -> {"homeTeam", "awayTeam", "lastSeq", "entries": {clé: incident}}
+        self._matches = {}
+
+    # Séquence courante (dernier numéro attribué)
+    @property
+    def seq(self):
+        return self._seq
+
+    # Ajouter au journal les incidents nouveaux ou modifiés d'un match ;
+    # renvoie la liste des (clé, incident) ajoutés
+    def update(self, match_id, home_team, away_team, incidents):
+        added = []
+        with self._lock:
+            log = self._matches.get(match_id)
+            if log is None:
+                log = {"homeTeam": home_team, "awayTeam": away_team, "lastSeq": 0, "entries": {}}
+                self._matches[match_id] = log
+
+            entries = log["entries"]
+            for incident in incidents:
+                key = incident_key(incident)
+                previous = entries.get(key)
+                if previous is not None and all(previous.get(field) == value for field, value in incident.items()):
+                    continue
+                self._seq += 1
+                entry = entries[key] = dict(incident, seq=self._seq)
+                log["lastSeq"] = self._seq
+                added.append((key, entry))
+        return added
+
+    # Ne conserver que les journaux des matchs encore suivis
+    def retain(self, match_ids):
+        with self._lock:
+            for match_id in [match_id for match_id in self._matches if match_id not in match_ids]:
+                del self._matches[match_id]
+
+    # Incidents dont la séquence est strictement supérieure à `since`
+    def since(self, since=0):
+        with self._lock:
+            matches = []
+            for match_id, log in self._matches.items():
+                if log["lastSeq"] <= since:
+                    continue
+                incidents = sorted(
+                    (incident for incident in log["entries"].values() if incident["seq"] > since),
+                    key=lambda incident: incident["seq"]
+                )
+                matches.append({
+                    "homeTeam": log["homeTeam"],
+                    "awayTeam": log["awayTeam"],
+                    "id": match_id,
+                    "incidents": incidents
+                })
+            return {"seq": self._seq, "matches": matches}
+
+    # Copie de l'état (séquence et journaux) pour le point de reprise
+    def dump(self):
+        with self._lock:
+            return {
+                "seq": self._seq,
+                "matches": {
+                    match_id: dict(log, entries=dict(log["entries"]))
+                    for match_id, log in self._matches.items()
+                }
+            }
+
+    # Reprendre un état sauvegardé : les curseurs ?since= des clients restent valables
+    def load(self, state):
+        with self._lock:
+            self._seq = max(self._seq, state["seq"])
+            self._matches.update(state["matches"])
@@ -1,109 +1,119 @@
 import json
 import time
 import asyncio
-import aiohttp
 import logging
-from flask import Flask, jsonify
+from aiohttp import web
+from client import client
+from config import API_BASE, POLL_SHARDS
+from snapshot import foot_store, incidents_store
+from circuit import breakers
+from scheduler import PRIORITY_LIVE_INCIDENTS, PollScheduler
+from incident_log import IncidentLog
+from metrics import LoopTimer
+from storage import storage
+from entities import player_name
+from shards import shard_pool
+from match_events import MatchTracker
+from capture import recorder
+from responses import query_number, snapshot_response
 
 # Configuration du logger pour enregistrer les erreurs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Création de l'application Flask
-app = Flask(__name__)
+# Routes HTTP du module (servies par server.py)
+routes = web.RouteTableDef()
+
+# Fonction pour extraire les incidents en direct d'une réponse de l'API
+def extract_incidents(match_id, data):
+    incidents = []
+
+    if 'incidents' in data:
+        for incident in data['incidents']:
+            if incident.get("isLive", False):  # Vérifier si l'incident est en direct
+                incident_type = incident.get("incidentType")
+                incident_data = {
+                    "incidentId": incident.get("id"),
+                    "matchId": match_id,
+                    "incidentType": incident_type,
+                    "time": incident.get("time"),
+                    "team": "home" if incident.get("isHome", False) else "away"
+                }
+
+                # Ajouter des données spécifiques à chaque type d'incident
+                if incident_type == "goal":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id"),
+                        "score": {
+                            "home": incident.get("homeScore"),
+                            "away": incident.get("awayScore")
+                        }
+                    })
+                elif incident_type == "card":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id"),
+                        "cardType": incident.get("cardType"),
+                        "rescinded": incident.get("rescinded", False)
+                    })
+                elif incident_type == "substitution":
+                    incident_data.update({
+                        "playerIn": player_name(incident.get("playerIn")),
+                        "playerOut": player_name(incident.get("playerOut")),
+                        "injury": incident.get("injury", False)
+                    })
+                elif incident_type == "penalty":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id"),
+                        "outcome": incident.get("outcome")
+                    })
+                elif incident_type == "injury":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id")
+                    })
+                elif incident_type == "offside":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id")
+                    })
+                elif incident_type == "var":
+                    incident_data.update({
+                        "decision": incident.get("decision")
+                    })
+                elif incident_type == "corner":
+                    pass  # Pas d'informations spécifiques supplémentaires
+                elif incident_type == "foul":
+                    incident_data.update({
+                        "player": player_name(incident.get("player")),
+                        "playerId": incident.get("player", {}).get("id")
+                    })
+                elif incident_type == "freeKick":
+                    pass  # Pas d'informations spécifiques supplémentaires
+                elif incident_type in ["kickOff", "halfTime", "fullTime"]:
+                    incident_data.update({
+                        "score": {
+                            "home": incident.get("homeScore"),
+                            "away": incident.get("awayScore")
+                        }
+                    })
 
-# Fonction pour décoder les chaînes Unicode
-def decode_unicode_string(input_string):
-    try:
-        return input_string.encode('utf-8').decode('unicode_escape')
-    except Exception as e:
-        logging.error(f"Erreur de décodage de la chaîne : {e}")
-        return input_string
+                incidents.append(incident_data)
+
+    return incidents
 
 # Fonction pour récupérer les incidents en direct pour un match
 async def get_incidents_for_match(session, match_id):
-    url = f"https://www.sofascore.com/api/v1/event/{match_id}/incidents"
+    url = f"{API_BASE}/event/{match_id}/incidents"
 
     try:
-        async with session.get(url) as response:
+        async with session.get(url, endpoint="incidents") as response:
+            body = await response.read()
+            if recorder is not None:
+                recorder.record("incidents", match_id, response.status, body, url)
             if response.status == 200:
-                data = await response.json()
-                incidents = []
-
-                if 'incidents' in data:
-                    for incident in data['incidents']:
-                        if incident.get("isLive", False):  # Vérifier si l'incident est en direct
-                            incident_type = incident.get("incidentType")
-                            incident_data = {
-                                "incidentId": incident.get("id"),
-                                "matchId": match_id,
-                                "incidentType": incident_type,
-                                "time": incident.get("time"),
-                                "team": "home" if incident.get("isHome", False) else "away"
-                            }
-
-                            # Ajouter des données spécifiques à chaque type d'incident
-                            if incident_type == "goal":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id"),
-                                    "score": {
-                                        "home": incident.get("homeScore"),
-                                        "away": incident.get("awayScore")
-                                    }
-                                })
-                            elif incident_type == "card":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id"),
-                                    "cardType": incident.get("cardType"),
-                                    "rescinded": incident.get("rescinded", False)
-                                })
-                            elif incident_type == "substitution":
-                                incident_data.update({
-                                    "playerIn": incident.get("playerIn", {}).get("name"),
-                                    "playerOut": incident.get("playerOut", {}).get("name"),
-                                    "injury": incident.get("injury", False)
-                                })
-                            elif incident_type == "penalty":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id"),
-                                    "outcome": incident.get("outcome")
-                                })
-                            elif incident_type == "injury":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id")
-                                })
-                            elif incident_type == "offside":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id")
-                                })
-                            elif incident_type == "var":
-                                incident_data.update({
-                                    "decision": incident.get("decision")
-                                })
-                            elif incident_type == "corner":
-                                pass  # Pas d'informations spécifiques supplémentaires
-                            elif incident_type == "foul":
-                                incident_data.update({
-                                    "player": incident.get("player", {}).get("name"),
-                                    "playerId": incident.get("player", {}).get("id")
-                                })
-                            elif incident_type == "freeKick":
-                                pass  # Pas d'informations spécifiques supplémentaires
-                            elif incident_type in ["kickOff", "halfTime", "fullTime"]:
-                                incident_data.update({
-                                    "score": {
-                                        "home": incident.get("homeScore"),
-                                        "away": incident.get("awayScore")
-                                    }
-                                })
-
-                            incidents.append(incident_data)
-
-                return incidents
+                return extract_incidents(match_id, json.loads(body))
             else:
                 logging.warning(f"Erreur lors de la récupération des incidents pour le match {match_id}. Code: {response.status}")
                 return None
@@ -111,79 +121,134 @@ async def get_incidents_for_match(session, match_id):
         logging.error(f"Erreur lors de la requête pour récupérer les incidents du match {match_id}: {e}")
         return None
 
-# Fonction pour filtrer et sauvegarder les matchs en direct
-async def filter_and_save_matches():
-    with open('foot.json', 'r', encoding='utf-8') as file:
-        data = json.load(file)
+# Planificateur : seuls les matchs en cours sont interrogés, dans la limite du budget global
+scheduler = PollScheduler(live_interval=1, priorities={"inprogress": PRIORITY_LIVE_INCIDENTS})
 
-    live_matches = []
-
-    async with aiohttp.ClientSession() as session:
-
-        async def filter_matches(matches):
-            tasks = []
-            for match in matches:
-                if isinstance(match, dict) and match.get("status") == "inprogress":
-                    match_id = match["id"]
-                    task_incidents = get_incidents_for_match(session, match_id)
-                    tasks.append(task_incidents)
+# Disjoncteur de l'endpoint des incidents
+breaker = breakers["incidents"]
 
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+# Derniers incidents connus par match
+incidents_by_match = {}
 
-            for idx, match in enumerate(matches):
-                if isinstance(match, dict) and match.get("status") == "inprogress":
-                    incidents_result = results[idx]
-
-                    if isinstance(incidents_result, list):
-                        match_data = {
-                            "homeTeam": decode_unicode_string(match["homeTeam"]),
-                            "awayTeam": decode_unicode_string(match["awayTeam"]),
-                            "id": match["id"],
-                            "incidents": incidents_result
-                        }
-                        live_matches.append(match_data)
+# Journal incrémental des incidents (séquences pour /live_matches/incidents)
+incident_log = IncidentLog()
 
-        if isinstance(data, list):
-            await filter_matches(data)
+# Matchs en cours, tenus à jour par les transitions diffusées par foot.py
+tracker = MatchTracker(statuses=("inprogress",))
 
-        if "ongoing" in data:
-            await filter_matches(data["ongoing"])
+# Fonction pour rafraîchir et sauvegarder les incidents des matchs en direct
+async def filter_and_save_matches():
+    # Appliquer les transitions : un match est suivi dès son coup d'envoi, oublié à sa fin
+    changes = tracker.refresh(foot_store.current())
+    matches = tracker.matches
+    for match_id in changes.stopped:
+        scheduler.remove(match_id)
+        incidents_by_match.pop(match_id, None)
+    for match in (*changes.started.values(), *changes.updated.values()):
+        scheduler.update(match)
+
+    # Journaux des matchs terminés (et, au premier lot, incidents repris des matchs qui ne sont plus en cours)
+    if changes.initial:
+        for match_id in [match_id for match_id in incidents_by_match if match_id not in matches]:
+            del incidents_by_match[match_id]
+    if changes.stopped or changes.initial:
+        incident_log.retain(matches)
+
+    # Endpoint suspendu : aucune requête ; seules les transitions sont republiées
+    permitted = breaker.permits(scheduler.pending)
+
+    # Ne rafraîchir que les matchs dont l'échéance est atteinte
+    due_ids = scheduler.due(limit=permitted) if permitted != 0 else []
+    if not due_ids and not changes:
+        return
+
+    # Client HTTP partagé : connexions conservées d'un cycle à l'autre
+    # (en mode réparti, chaque processus traite les matchs qui lui reviennent)
+    if not due_ids:
+        results = []
+    elif POLL_SHARDS:
+        results = await shard_pool().map("incidents", due_ids)
+    else:
+        session = client
+        results = await asyncio.gather(*(get_incidents_for_match(session, match_id) for match_id in due_ids), return_exceptions=True)
+    new_incidents = []
+    # Listes modifiées, y compris les incidents retirés par l'API (but annulé par la VAR...)
+    modified = False
+    for match_id, incidents_result in zip(due_ids, results):
+        if isinstance(incidents_result, list):
+            if incidents_by_match.get(match_id) != incidents_result:
+                modified = True
+            incidents_by_match[match_id] = incidents_result
+            match = matches[match_id]
+            new_incidents += incident_log.update(
+                match_id,
+                match["homeTeam"],
+                match["awayTeam"],
+                incidents_result
+            )
+    added = len(new_incidents)
+
+    # Une seule écriture SQLite par cycle
+    if storage is not None and new_incidents:
+        storage.write_cycle(incidents=new_incidents)
+
+    # Ni liste d'incidents modifiée ni transition : le snapshot publié est toujours à jour
+    if not modified and not changes and incidents_store.data() is not None:
+        return
 
+    live_matches = []
+    for match_id, incidents in incidents_by_match.items():
+        match = matches[match_id]
+        match_data = {
+            "homeTeam": match["homeTeam"],
+            "awayTeam": match["awayTeam"],
+            "id": match_id,
+            "incidents": incidents
+        }
+        live_matches.append(match_data)
+
+    # Sérialisation et point de sauvegarde hors de la boucle asyncio
     if live_matches:
-        with open('evenements.json', 'w', encoding='utf-8') as file:
-            json.dump(live_matches, file, ensure_ascii=False, indent=4)
-        logging.info("Les matchs en cours avec leurs incidents ont été enregistrés dans evenements.json.")
+        await asyncio.to_thread(incidents_store.publish, live_matches)
+        logging.info(f"{added} incident(s) nouveau(x), {len(live_matches)} match(s) publiés (séquence {incident_log.seq}).")
     else:
+        # Les derniers matchs suivis sont terminés : ne plus servir leurs incidents
+        if incidents_store.data():
+            await asyncio.to_thread(incidents_store.publish, [])
         logging.warning("Aucun match en cours n'a été trouvé.")
 
-# Route pour afficher les matchs en cours
-@app.route('/live_matches', methods=['GET'])
-def get_live_matches():
-    try:
-        with open('evenements.json', 'r', encoding='utf-8') as file:
-            live_matches = json.load(file)
-        return jsonify(live_matches)
-    except Exception as e:
-        logging.error(f"Erreur lors de la récupération des matchs en direct: {e}")
-        return jsonify({"error": "Could not fetch live matches"}), 500
+# Route pour afficher les matchs en cours avec tous leurs incidents
+@routes.get('/live_matches/events')
+async def get_live_matches(request):
+    return snapshot_response(request, incidents_store.current(), "Could not fetch live matches", 500)
+
+# Route pour récupérer uniquement les incidents postérieurs à une séquence donnée
+@routes.get('/live_matches/incidents')
+async def get_live_incidents(request):
+    since = query_number(request, 'since', 0)
+    return web.json_response(incident_log.since(since))
 
-# Fonction principale pour démarrer la boucle et Flask
+# État conservé d'un redémarrage à l'autre (voir state_checkpoint.py) : les séquences
+# reprennent là où elles s'étaient arrêtées
+def dump_state():
+    return {"incidents_by_match": dict(incidents_by_match), "incident_log": incident_log.dump()}
+
+def restore_state(state):
+    for match_id, incidents in state["incidents_by_match"].items():
+        incidents_by_match.setdefault(match_id, incidents)
+    incident_log.load(state["incident_log"])
+
+# Fonction principale pour exécuter la boucle asynchrone
 async def main():
+    cycle_timer = LoopTimer("incidents", 1)
     while True:
-        await filter_and_save_matches()
+        with cycle_timer:
+            await filter_and_save_matches()
+        stats = client.stats()
+        logging.info(f"Pool HTTP: {stats['requests']} requêtes, {stats['connections_reused']} connexions réutilisées, attente moyenne {stats['queue_wait_avg']:.3f}s")
         await asyncio.sleep(1)
 
-# Fonction pour lancer Flask
-def run_flask():
-    app.run(host='0.0.0.0', port=10000)  # Lancer Flask sur le port 10000
-
+# Lancer uniquement ce module (routes et boucle) dans le serveur commun
 if __name__ == "__main__":
-    # Exécution en parallèle de Flask et de la boucle asynchrone
-    from threading import Thread
-
-    # Lancer Flask dans un thread séparé
-    flask_thread = Thread(target=run_flask)
-    flask_thread.start()
-
-    # Lancer la boucle principale en mode asynchrone
-    asyncio.run(main())
+    import server
+    server.main(["incidents"])
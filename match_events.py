@@ -0,0 +1,172 @@
+import asyncio
+
+# Étape de diff entre deux snapshots "foot" successifs (structure finished/ongoing/upcoming).
+# Les matchs sont comparés par id ; foot.py réutilise l'objet Match d'un événement inchangé,
+# si bien que seuls les matchs re-normalisés sont réellement comparés. Chaque transition
+# donne un événement typé, diffusé aux abonnés (pollers des cotes, incidents et lineups)
+# sur une file asyncio ; les abonnés ne démarrent ou n'arrêtent le travail par match que
+# sur ces transitions, au lieu de re-filtrer toute la journée à chaque cycle.
+# Toutes les opérations du canal ont lieu dans le thread de la boucle asyncio.
+
+# Types d'événements
+MATCH_ADDED = "added"
+MATCH_KICKED_OFF = "kicked_off"
+SCORE_CHANGED = "score_changed"
+MATCH_FINISHED = "finished"
+# Autre changement de statut (reporté, interrompu, annulé...)
+STATUS_CHANGED = "status_changed"
+# Coup d'envoi ou équipes modifiés sans changement de statut
+MATCH_UPDATED = "updated"
+MATCH_REMOVED = "removed"
+
+# Champs qui déclenchent MATCH_UPDATED
+UPDATED_FIELDS = ("startTime", "homeTeam", "awayTeam")
+
+
+class MatchEvent:
+    __slots__ = ("type", "match_id", "match", "previous")
+
+    def __init__(self, type, match_id, match, previous=None):
+        self.type = type
+        self.match_id = match_id
+        # Match courant (None pour MATCH_REMOVED) et match du snapshot précédent
+        self.match = match
+        self.previous = previous
+
+    def __repr__(self):
+        return f"MatchEvent({self.type!r}, {self.match_id!r})"
+
+
+# Matchs d'un snapshot indexés par id
+def matches_by_id(data):
+    matches = {}
+    for category in ("finished", "ongoing", "upcoming"):
+        for match in data.get(category, []):
+            matches[match["id"]] = match
+    return matches
+
+
+# Événements de transition entre deux ensembles de matchs {id: match}
+def diff_matches(previous, current):
+    events = []
+    for match_id, match in current.items():
+        old = previous.get(match_id)
+        if old is match:
+            continue
+        if old is None:
+            events.append(MatchEvent(MATCH_ADDED, match_id, match))
+            continue
+
+        status = match.get("status")
+        if status != old.get("status"):
+            if status == "inprogress":
+                event_type = MATCH_KICKED_OFF
+            elif status == "finished":
+                event_type = MATCH_FINISHED
+            else:
+                event_type = STATUS_CHANGED
+            events.append(MatchEvent(event_type, match_id, match, old))
+        elif any(match.get(field) != old.get(field) for field in UPDATED_FIELDS):
+            events.append(MatchEvent(MATCH_UPDATED, match_id, match, old))
+        if match.get("homeScore") != old.get("homeScore") or match.get("awayScore") != old.get("awayScore"):
+            events.append(MatchEvent(SCORE_CHANGED, match_id, match, old))
+
+    for match_id, old in previous.items():
+        if match_id not in current:
+            events.append(MatchEvent(MATCH_REMOVED, match_id, None, old))
+    return events
+
+
+class MatchEventChannel:
+    def __init__(self):
+        self._source = None
+        self._matches = {}
+        self._subscribers = []
+        # foot.py hébergé dans ce processus (voir foot.py) : ses publications sont la source
+        self.local_source = False
+
+    # Comparer un snapshot au précédent et diffuser les transitions (sans effet si déjà observé).
+    # Quand foot.py tourne dans le processus, le snapshot relu au démarrage n'est pas diffusé :
+    # ses matchs ne sont pas des matchs en direct, les pollers attendent la première publication.
+    # Sinon (poller lancé seul), le point de sauvegarde de foot.py est la seule source.
+    def observe(self, snapshot):
+        if snapshot is None or snapshot is self._source:
+            return
+        if snapshot.from_checkpoint and self.local_source:
+            return
+        current = matches_by_id(snapshot.data)
+        events = diff_matches(self._matches, current)
+        self._source = snapshot
+        self._matches = current
+        if events:
+            for queue in self._subscribers:
+                queue.put_nowait(events)
+
+    # Nouvelle file d'événements ; elle reçoit d'abord MATCH_ADDED pour les matchs déjà connus
+    def subscribe(self):
+        queue = asyncio.Queue()
+        if self._matches:
+            queue.put_nowait([MatchEvent(MATCH_ADDED, match_id, match) for match_id, match in self._matches.items()])
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.remove(queue)
+
+
+# Canal partagé du processus, alimenté par foot.py après chaque publication
+channel = MatchEventChannel()
+
+
+# Changements à appliquer par un abonné après un rafraîchissement
+class TrackedChanges:
+    __slots__ = ("started", "updated", "stopped", "initial")
+
+    def __init__(self, initial=False):
+        # Matchs entrés dans les statuts suivis et matchs suivis modifiés ({id: match}),
+        # ids sortis du suivi
+        self.started = {}
+        self.updated = {}
+        self.stopped = set()
+        # Premier lot reçu : l'abonné peut y réconcilier un état repris au démarrage
+        self.initial = initial
+
+    def __bool__(self):
+        return bool(self.started or self.updated or self.stopped)
+
+
+# Matchs d'un abonné restreints à certains statuts, tenus à jour à partir des événements
+class MatchTracker:
+    def __init__(self, statuses, channel=channel):
+        self.statuses = frozenset(statuses)
+        self.channel = channel
+        self.matches = {}
+        self._queue = channel.subscribe()
+        self._received = False
+
+    # Observer le snapshot courant (s'il n'a pas encore été diffusé) puis appliquer les événements reçus
+    def refresh(self, snapshot=None):
+        if snapshot is not None:
+            self.channel.observe(snapshot)
+        changes = TrackedChanges(initial=not self._received and not self._queue.empty())
+        while not self._queue.empty():
+            self._received = True
+            for event in self._queue.get_nowait():
+                self._apply(event, changes)
+        return changes
+
+    def _apply(self, event, changes):
+        match_id = event.match_id
+        match = event.match
+        if match is not None and match.get("status") in self.statuses:
+            if match_id in changes.started or (match_id not in self.matches and match_id not in changes.stopped):
+                changes.started[match_id] = match
+            else:
+                changes.stopped.discard(match_id)
+                changes.updated[match_id] = match
+            self.matches[match_id] = match
+        elif match_id in self.matches:
+            del self.matches[match_id]
+            changes.started.pop(match_id, None)
+            changes.updated.pop(match_id, None)
+            changes.stopped.add(match_id)
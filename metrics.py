@@ -0,0 +1,226 @@
+import time
+import bisect
+import asyncio
+from aiohttp import web
+
+# Métriques au format texte Prometheus, exposées sur /metrics.
+# Les séries sont créées une fois (jeux de labels fermés : boucles, endpoints amont,
+# routes) et le chemin critique se limite à une addition ou à une recherche de bucket.
+
+# Buckets de durée (en secondes)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _registry.append(self)
+
+    # Série correspondant aux valeurs de labels (créée au premier appel puis réutilisée)
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+# Jauge calculée à la lecture (par exemple l'âge d'un snapshot)
+class CallbackGauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, callback):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.callback():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames + ("le",), values + (_format_value(float(bound)),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+# Boucles de rafraîchissement
+LOOPS = ("foot", "scores", "incidents", "classements")
+loop_cycle_duration = Histogram("api_loop_cycle_duration_seconds", "Duration of one refresh cycle", ["loop"])
+loop_lag = Gauge("api_loop_lag_seconds", "Delay between the scheduled and the actual start of the last cycle", ["loop"])
+loop_last_cycle = Gauge("api_loop_last_cycle_timestamp_seconds", "End time of the last completed cycle", ["loop"])
+loop_errors = Counter("api_loop_errors_total", "Cycles that raised an exception", ["loop"])
+
+# Requêtes vers l'API amont, par endpoint ("scheduled-events-days" : autres jours demandés par
+# les clients, séparés de la boucle du jour courant)
+UPSTREAM_ENDPOINTS = ("scheduled-events", "scheduled-events-days", "odds", "incidents", "lineups")
+upstream_duration = Histogram("api_upstream_request_duration_seconds", "Upstream latency until response headers", ["endpoint"])
+upstream_responses = Counter("api_upstream_responses_total", "Upstream responses by status code", ["endpoint", "status"])
+upstream_bytes = Counter("api_upstream_received_bytes_total", "Bytes received from upstream", ["endpoint"])
+upstream_retries = Counter("api_upstream_retries_total", "Upstream requests retried or deferred after a failure", ["endpoint"])
+upstream_circuit_state = Gauge("api_upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ["endpoint"])
+
+# Snapshots publiés
+snapshot_serialization = Histogram("api_snapshot_serialization_seconds", "Time to serialize and compress a snapshot", ["store"])
+
+# Routes HTTP (label : motif de la route, pas le chemin réel)
+route_duration = Histogram("api_route_duration_seconds", "Route handler latency", ["route", "method"])
+
+
+# Instrumentation d'une boucle : durée du cycle et retard par rapport à l'échéance prévue
+class LoopTimer:
+    def __init__(self, loop, interval):
+        self.interval = interval
+        self._duration = loop_cycle_duration.labels(loop)
+        self._lag = loop_lag.labels(loop)
+        self._last_cycle = loop_last_cycle.labels(loop)
+        self._errors = loop_errors.labels(loop)
+        self._expected = None
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        if self._expected is not None:
+            self._lag.set(max(0.0, self._started - self._expected))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        self._duration.observe(ended - self._started)
+        self._last_cycle.set(time.time())
+        self._expected = ended + self.interval
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self._errors.inc()
+        return False
+
+
+# Séries pré-créées pour les labels connus
+for _loop in LOOPS:
+    loop_cycle_duration.labels(_loop)
+    loop_lag.labels(_loop)
+    loop_last_cycle.labels(_loop)
+    loop_errors.labels(_loop)
+for _endpoint in UPSTREAM_ENDPOINTS:
+    upstream_duration.labels(_endpoint)
+    upstream_bytes.labels(_endpoint)
+    upstream_retries.labels(_endpoint)
+    upstream_circuit_state.labels(_endpoint)
+
+
+# Texte complet au format d'exposition Prometheus
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Middleware aiohttp : latence de chaque route, étiquetée par son motif
+@web.middleware
+async def route_metrics_middleware(request, handler):
+    started = time.perf_counter()
+    try:
+        return await handler(request)
+    finally:
+        # Requêtes sans route : un seul label, quel que soit le chemin ou la méthode
+        resource = request.match_info.route.resource
+        if resource is None:
+            route_duration.labels("unmatched", "-").observe(time.perf_counter() - started)
+        else:
+            route_duration.labels(resource.canonical, request.method).observe(time.perf_counter() - started)
+
+
+routes = web.RouteTableDef()
+
+
+@routes.get('/metrics')
+async def get_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
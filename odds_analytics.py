@@ -0,0 +1,184 @@
+import math
+import time
+import logging
+import importlib.util
+from snapshot import Snapshot
+
+# numpy est importé au premier tick (démarrage plus rapide) ; voir _load_numpy()
+numpy = None
+
+# Analyses des cotes 1/X/2 de tous les matchs suivis (en cours et à venir).
+# Les cotes courantes et celles du tick précédent sont rangées en colonnes (une ligne par
+# match, une colonne par issue) ; cotes décimales, probabilités implicites, marge du
+# bookmaker (overround), cotes équitables sans marge et variations depuis le dernier tick
+# sont calculées pour tous les matchs en une seule passe vectorisée (numpy).
+# Le résultat est sérialisé une seule fois par tick, à la première requête /odds/analytics.
+# Sans numpy, les analyses sont désactivées (analytics vaut None).
+# Les tableaux ne sont alloués (et numpy importé) qu'au premier tick.
+
+# Issues, dans l'ordre des colonnes
+OUTCOMES = ("1", "X", "2")
+
+# Nombre de lignes allouées au départ (doublé à chaque dépassement)
+INITIAL_CAPACITY = 1024
+
+# Décimales des valeurs publiées
+PRECISION = 4
+
+
+def _load_numpy():
+    global numpy
+    if numpy is None:
+        import numpy as module
+        numpy = module
+    return numpy
+
+
+# Colonne en valeurs JSON : arrondie, NaN remplacé par None
+def _json_column(values):
+    return numpy.where(numpy.isnan(values), None, numpy.round(values, PRECISION)).tolist()
+
+
+class OddsAnalytics:
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.capacity = capacity
+        self._rows = {}
+        self._count = 0
+        self._ids = None
+        self._updated_at = 0.0
+        self.version = 0
+        self._snapshot = None
+
+    def __len__(self):
+        return self._count
+
+    def _allocate(self):
+        _load_numpy()
+        self._ids = numpy.zeros(self.capacity, dtype=numpy.int64)
+        self._live = numpy.zeros(self.capacity, dtype=bool)
+        self._current = numpy.full((self.capacity, len(OUTCOMES)), numpy.nan)
+        self._previous = numpy.full((self.capacity, len(OUTCOMES)), numpy.nan)
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == len(self._ids):
+            return
+        for name, fill in (("_ids", 0), ("_live", False), ("_current", numpy.nan), ("_previous", numpy.nan)):
+            old = getattr(self, name)
+            new = numpy.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+    # Oublier les matchs qui ne sont plus suivis (compactage des colonnes)
+    def retain(self, match_ids):
+        if all(match_id in match_ids for match_id in self._rows):
+            return
+        count = self._count
+        keep = numpy.fromiter((match_id in match_ids for match_id in self._ids[:count].tolist()), dtype=bool, count=count)
+        kept = int(keep.sum())
+        for name in ("_ids", "_live", "_current", "_previous"):
+            column = getattr(self, name)
+            column[:kept] = column[:count][keep]
+        self._count = kept
+        self._rows = {match_id: row for row, match_id in enumerate(self._ids[:kept].tolist())}
+        self.version += 1
+
+    # Enregistrer les cotes d'un tick : [(id, {"1": .., "X": .., "2": ..}, en cours ?)].
+    # Les cotes remplacées deviennent la référence des variations.
+    def update(self, ticks, timestamp=None):
+        if not ticks:
+            return
+        if self._ids is None:
+            self._allocate()
+        rows = []
+        for match_id, _, _ in ticks:
+            row = self._rows.get(match_id)
+            if row is None:
+                row = self._count
+                self._grow(row + 1)
+                self._ids[row] = match_id
+                self._rows[match_id] = row
+                self._count += 1
+            rows.append(row)
+        rows = numpy.array(rows, dtype=numpy.intp)
+        values = numpy.array(
+            [[odds.get(outcome) or math.nan for outcome in OUTCOMES] for _, odds, _ in ticks],
+            dtype=numpy.float64
+        )
+        self._previous[rows] = self._current[rows]
+        self._current[rows] = values
+        self._live[rows] = [live for _, _, live in ticks]
+        self._updated_at = time.time() if timestamp is None else timestamp
+        self.version += 1
+
+    # Calcul vectorisé sur tous les matchs ; colonnes numpy indexées comme `ids`
+    def compute(self):
+        count = self._count
+        odds = self._current[:count]
+        previous = self._previous[:count]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            implied = 1.0 / odds
+            # Somme des probabilités implicites (NaN si une issue manque)
+            overround = implied.sum(axis=1)
+            fair_probabilities = implied / overround[:, None]
+            fair_odds = odds * overround[:, None]
+            change = odds - previous
+            relative_change = change / previous
+        return {
+            "ids": self._ids[:count],
+            "live": self._live[:count],
+            "odds": odds,
+            "probabilities": implied,
+            "overround": overround,
+            "margin": overround - 1.0,
+            "fairProbabilities": fair_probabilities,
+            "fairOdds": fair_odds,
+            "change": change,
+            "relativeChange": relative_change
+        }
+
+    # Snapshot des analyses, recalculé seulement si des cotes ont changé depuis le dernier appel
+    def snapshot(self):
+        if self._snapshot is not None and self._snapshot.version == self.version:
+            return self._snapshot
+        if not self._count:
+            return None
+        started = time.perf_counter()
+        columns = self.compute()
+        per_outcome = {
+            name: [dict(zip(OUTCOMES, row)) for row in zip(*(_json_column(columns[name][:, i]) for i in range(len(OUTCOMES))))]
+            for name in ("odds", "probabilities", "fairProbabilities", "fairOdds", "change", "relativeChange")
+        }
+        overround = _json_column(columns["overround"])
+        margin = _json_column(columns["margin"])
+        matches = [
+            {
+                "id": match_id,
+                "status": "inprogress" if live else "notstarted",
+                "odds": per_outcome["odds"][i],
+                "probabilities": per_outcome["probabilities"][i],
+                "overround": overround[i],
+                "margin": margin[i],
+                "fairProbabilities": per_outcome["fairProbabilities"][i],
+                "fairOdds": per_outcome["fairOdds"][i],
+                "change": per_outcome["change"][i],
+                "relativeChange": per_outcome["relativeChange"][i]
+            }
+            for i, (match_id, live) in enumerate(zip(columns["ids"].tolist(), columns["live"].tolist()))
+        ]
+        complete = ~numpy.isnan(columns["margin"])
+        data = {
+            "updatedAt": self._updated_at,
+            "matches": len(matches),
+            "averageMargin": round(float(columns["margin"][complete].mean()), PRECISION) if complete.any() else None,
+            "analytics": matches
+        }
+        self._snapshot = Snapshot(self.version, time.time(), data, "odds_analytics")
+        logging.debug(f"Analyses des cotes : {len(matches)} match(s) en {time.perf_counter() - started:.4f}s")
+        return self._snapshot
+
+
+# Analyses partagées (None si numpy n'est pas installé)
+analytics = OddsAnalytics() if importlib.util.find_spec("numpy") is not None else None
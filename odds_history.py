@@ -0,0 +1,166 @@
+import math
+import time
+import bisect
+import threading
+from array import array
+
+# Historique compact des cotes 1/X/2.
+# Une série par match, stockée dans des tableaux typés (timestamps uint32, cotes float32,
+# soit 16 octets par point) ; un point n'est ajouté que si une cote change.
+# La mémoire est bornée : au-delà de MAX_POINTS_PER_MATCH, la moitié la plus ancienne
+# de la série est sous-échantillonnée (un point sur deux), et au-delà de MAX_MATCHES
+# les séries les moins récemment mises à jour sont supprimées.
+
+# Nombre maximal de points conservés par match
+MAX_POINTS_PER_MATCH = 256
+
+# Nombre maximal de matchs suivis
+MAX_MATCHES = 5000
+
+# Issues suivies, dans l'ordre de stockage
+OUTCOMES = ("1", "X", "2")
+
+
+class OddsSeries:
+    __slots__ = ("timestamps", "values")
+
+    def __init__(self):
+        self.timestamps = array("I")
+        self.values = tuple(array("f") for _ in OUTCOMES)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    # Ajouter un point si au moins une cote a changé ; renvoie True si le point est ajouté
+    def append(self, timestamp, odds):
+        point = array("f", (odds.get(outcome, math.nan) or math.nan for outcome in OUTCOMES))
+        if self.timestamps and all(
+            column[-1] == value or (math.isnan(column[-1]) and math.isnan(value))
+            for column, value in zip(self.values, point)
+        ):
+            return False
+        self.timestamps.append(int(timestamp))
+        for column, value in zip(self.values, point):
+            column.append(value)
+        return True
+
+    # Sous-échantillonner la moitié la plus ancienne (le point le plus ancien est conservé)
+    def downsample(self):
+        half = len(self.timestamps) // 2
+        self.timestamps[:half] = self.timestamps[:half:2]
+        for column in self.values:
+            column[:half] = column[:half:2]
+
+    # Valeurs (1, X, 2) du point d'indice `index`
+    def point(self, index):
+        return tuple(column[index] for column in self.values)
+
+
+# Convertir une cote stockée (float32, NaN si absente) en valeur JSON
+def _odds_value(value):
+    return None if math.isnan(value) else round(value, 4)
+
+
+class OddsHistory:
+    def __init__(self, max_points=MAX_POINTS_PER_MATCH, max_matches=MAX_MATCHES):
+        self.max_points = max_points
+        self.max_matches = max_matches
+        self._lock = threading.Lock()
+        self._series = {}
+
+    # Enregistrer les cotes courantes d'un match (ignorées si elles n'ont pas changé)
+    def record(self, match_id, odds, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            series = self._series.pop(match_id, None)
+            if series is None:
+                series = OddsSeries()
+                if len(self._series) >= self.max_matches:
+                    # Les dictionnaires conservent l'ordre d'insertion : le premier est le plus ancien
+                    del self._series[next(iter(self._series))]
+            # Réinsérer la série en fin de dictionnaire (la plus récemment mise à jour)
+            self._series[match_id] = series
+            added = series.append(timestamp, odds)
+            if len(series) > self.max_points:
+                series.downsample()
+            return added
+
+    # Historique d'un match, éventuellement limité aux points postérieurs à `since`
+    def history(self, match_id, since=None):
+        with self._lock:
+            series = self._series.get(match_id)
+            if series is None:
+                return None
+            start = bisect.bisect_left(series.timestamps, int(since)) if since else 0
+            return [
+                dict(zip(("timestamp",) + OUTCOMES, (series.timestamps[i],) + tuple(_odds_value(v) for v in series.point(i))))
+                for i in range(start, len(series))
+            ]
+
+    # Plus fortes variations relatives de cote sur les `window` dernières secondes
+    def movers(self, window, limit=20, now=None):
+        now = time.time() if now is None else now
+        start = int(now - window)
+        movers = []
+        with self._lock:
+            for match_id, series in self._series.items():
+                count = len(series)
+                if count < 2 or series.timestamps[-1] < start:
+                    continue
+                # Référence : la cote en vigueur au début de la fenêtre (ou le premier point de la fenêtre)
+                index = bisect.bisect_right(series.timestamps, start) - 1
+                reference = series.point(max(index, 0))
+                latest = series.point(count - 1)
+
+                best_outcome = None
+                best_change = 0.0
+                for outcome, before, after in zip(OUTCOMES, reference, latest):
+                    if math.isnan(before) or math.isnan(after) or before == 0:
+                        continue
+                    change = (after - before) / before
+                    if abs(change) > abs(best_change):
+                        best_outcome, best_change = outcome, change
+                if best_outcome is not None:
+                    movers.append((abs(best_change), match_id, best_outcome, best_change, reference, latest))
+
+        movers.sort(key=lambda mover: mover[0], reverse=True)
+        return [
+            {
+                "id": match_id,
+                "outcome": outcome,
+                "change": round(change, 4),
+                "from": dict(zip(OUTCOMES, map(_odds_value, reference))),
+                "to": dict(zip(OUTCOMES, map(_odds_value, latest)))
+            }
+            for _, match_id, outcome, change, reference, latest in movers[:limit]
+        ]
+
+    # Copie des séries (tableaux typés) pour le point de reprise
+    def dump(self):
+        with self._lock:
+            return {
+                match_id: (series.timestamps[:], tuple(column[:] for column in series.values))
+                for match_id, series in self._series.items()
+            }
+
+    # Reprendre des séries sauvegardées (les séries déjà présentes sont conservées)
+    def load(self, state):
+        with self._lock:
+            for match_id, (timestamps, values) in state.items():
+                if match_id in self._series:
+                    continue
+                series = OddsSeries()
+                series.timestamps = timestamps
+                series.values = values
+                self._series[match_id] = series
+
+    # Nombre de matchs et de points stockés, et mémoire utilisée par les tableaux
+    def stats(self):
+        with self._lock:
+            points = sum(len(series) for series in self._series.values())
+            memory = sum(
+                series.timestamps.buffer_info()[1] * series.timestamps.itemsize
+                + sum(column.buffer_info()[1] * column.itemsize for column in series.values)
+                for series in self._series.values()
+            )
+            return {"matches": len(self._series), "points": points, "bytes": memory}
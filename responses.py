@@ -0,0 +1,73 @@
+from datetime import date
+from aiohttp import web
+
+# Outils communs aux routes HTTP des différents modules
+
+
+# Lire un paramètre entier/flottant de la requête ; 400 si la valeur est invalide
+def query_number(request, name, default=None, type=int):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Invalid value for '{name}': {value}")
+
+
+# Lire un paramètre date (YYYY-MM-DD) de la requête ; 400 si la valeur est invalide
+def query_date(request, name, default=None):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Invalid date for '{name}': {value} (expected YYYY-MM-DD)")
+
+
+# Réponse d'erreur JSON
+def json_error(message, status):
+    return web.json_response({"error": message}, status=status)
+
+
+# Vérifier si l'en-tête If-None-Match correspond à l'ETag courant
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# Servir un snapshot depuis ses octets pré-sérialisés (304 si le client est à jour)
+def snapshot_response(request, snapshot, error_message="Data not found", error_status=404):
+    if snapshot is None:
+        return json_error(error_message, error_status)
+
+    encoded = snapshot.encoded()
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    encoding = None
+    body = encoded.body
+    if encoded.brotli is not None and "br" in accept_encoding:
+        encoding = "br"
+        body = encoded.brotli
+    elif "gzip" in accept_encoding:
+        encoding = "gzip"
+        body = encoded.gzip
+
+    # Chaque codage a son propre ETag : un validateur fort ne désigne qu'une représentation
+    etag = encoded.etag_for(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return web.Response(status=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=body, headers=headers, content_type="application/json", charset="utf-8")
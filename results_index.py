@@ -0,0 +1,153 @@
+import json
+import base64
+import bisect
+import threading
+from datetime import datetime
+
+# Index secondaires des matchs d'un snapshot "foot" (structure finished/ongoing/upcoming),
+# construits une seule fois par snapshot publié. Les matchs sont rangés par coup d'envoi
+# puis par id ; chaque index (statut, tournoi, équipe, saison) associe une valeur à la liste
+# triée des positions correspondantes, et les bornes de coup d'envoi se résolvent par
+# recherche dichotomique. Une requête filtrée coûte ainsi O(résultat) et non O(journée).
+
+# Nombre de résultats par défaut et maximal d'une page
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Nombre d'index conservés (snapshot du jour et jours consultés récemment)
+MAX_CACHED_INDEXES = 8
+
+# Champs d'un match que l'on peut demander dans ?fields=
+FIELDS = (
+    "homeTeam", "awayTeam", "startTime", "id", "seasonId", "homeScore",
+    "awayScore", "status", "tournament", "endTime", "currentTime"
+)
+
+# Noms des catégories de /results acceptés comme statuts
+STATUS_ALIASES = {"ongoing": "inprogress", "upcoming": "notstarted"}
+
+
+# Clé de tri : coup d'envoi ("%Y-%m-%d %H:%M:%S" se trie comme une chaîne, "Unknown" en dernier) puis id
+def sort_key(match):
+    match_id = match.get("id")
+    return (match.get("startTime") or "Unknown", match_id if isinstance(match_id, int) else 0)
+
+
+# Curseur opaque : clé de tri du dernier match renvoyé
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        start_time, match_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return (str(start_time), int(match_id))
+
+
+# Convertir une borne de coup d'envoi (date ou date-heure ISO) au format de startTime
+def parse_kickoff(value):
+    return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ResultsIndex:
+    __slots__ = ("matches", "keys", "by_status", "by_tournament", "by_team", "by_season")
+
+    def __init__(self, data):
+        matches = data.get("finished", []) + data.get("ongoing", []) + data.get("upcoming", [])
+        self.matches = sorted(matches, key=sort_key)
+        self.keys = [sort_key(match) for match in self.matches]
+        self.by_status = {}
+        self.by_tournament = {}
+        self.by_team = {}
+        self.by_season = {}
+        for position, match in enumerate(self.matches):
+            self.by_status.setdefault(match.get("status"), []).append(position)
+            self.by_tournament.setdefault(match.get("tournament"), []).append(position)
+            self.by_season.setdefault(match.get("seasonId"), []).append(position)
+            self.by_team.setdefault(match.get("homeTeam"), []).append(position)
+            if match.get("awayTeam") != match.get("homeTeam"):
+                self.by_team.setdefault(match.get("awayTeam"), []).append(position)
+        # Un match apparaît deux fois dans by_team (domicile puis extérieur) : listes triées par position
+        for positions in self.by_team.values():
+            positions.sort()
+
+    # Page de résultats : (matchs, curseur suivant ou None)
+    def query(self, status=None, tournament=None, team=None, season_id=None,
+              kickoff_from=None, kickoff_to=None, cursor=None, limit=DEFAULT_LIMIT):
+        # Plage de positions autorisée par les bornes de coup d'envoi et le curseur
+        low = 0
+        high = len(self.keys)
+        if kickoff_from is not None:
+            low = bisect.bisect_left(self.keys, (kickoff_from,))
+        if kickoff_to is not None:
+            high = bisect.bisect_right(self.keys, (kickoff_to, float("inf")))
+        elif kickoff_from is not None:
+            # Une borne de coup d'envoi exclut les matchs sans heure connue
+            high = bisect.bisect_left(self.keys, ("Unknown",))
+        if cursor is not None:
+            low = max(low, bisect.bisect_right(self.keys, cursor))
+
+        # Index le plus sélectif parmi les filtres demandés ; les autres filtres sont vérifiés par match
+        filters = []
+        if status is not None:
+            filters.append(("status", STATUS_ALIASES.get(status, status), self.by_status))
+        if tournament is not None:
+            filters.append(("tournament", tournament, self.by_tournament))
+        if season_id is not None:
+            filters.append(("seasonId", season_id, self.by_season))
+        if team is not None:
+            filters.append((None, team, self.by_team))
+
+        if filters:
+            candidates = min((index.get(value, ()) for _, value, index in filters), key=len)
+            start = bisect.bisect_left(candidates, low)
+            end = bisect.bisect_left(candidates, high)
+            positions = (candidates[i] for i in range(start, end))
+        else:
+            positions = iter(range(low, high))
+
+        page = []
+        for position in positions:
+            match = self.matches[position]
+            if all(
+                (match.get("homeTeam") == value or match.get("awayTeam") == value) if field is None else match.get(field) == value
+                for field, value, _ in filters
+            ):
+                page.append(match)
+                if len(page) > limit:
+                    break
+
+        next_cursor = None
+        if len(page) > limit:
+            page.pop()
+            next_cursor = encode_cursor(sort_key(page[-1]))
+        return page, next_cursor
+
+
+# Projection d'un match sur les champs demandés (absents : ignorés)
+def project(match, fields):
+    if fields is None:
+        return dict(match)
+    return {field: match[field] for field in fields if field in match}
+
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+# Index d'un snapshot, construit au premier appel puis réutilisé (clé : identité du snapshot)
+def index_for(snapshot):
+    key = id(snapshot)
+    with _lock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0] is snapshot:
+            return entry[1]
+    index = ResultsIndex(snapshot.data)
+    with _lock:
+        _indexes.pop(key, None)
+        _indexes[key] = (snapshot, index)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            del _indexes[next(iter(_indexes))]
+    return index
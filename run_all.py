@@ -1,6 +1,6 @@
-import subprocess
+import server
 
-subprocess.Popen(['python3', 'classements.py'])
-subprocess.Popen(['python3', 'foot.py'])
-subprocess.Popen(['python3', 'incidents.py'])
-subprocess.Popen(['python3', 'scores.py'])
+# Un seul processus héberge toutes les routes et toutes les boucles de rafraîchissement
+# (avec POLL_SHARDS, les requêtes par match sont déléguées à des processus de travail)
+if __name__ == "__main__":
+    server.main()
@@ -0,0 +1,181 @@
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+from config import MAX_REQUESTS_PER_SECOND, REQUEST_BURST
+
+# Planificateur adaptatif des requêtes par match.
+# La prochaine échéance de chaque match dépend de son statut et de l'heure du coup d'envoi
+# (champs "status" et "startTime" du snapshot foot) ; les matchs terminés ne sont plus interrogés.
+# Un budget global de requêtes par seconde est partagé par toutes les boucles du processus,
+# avec des classes de priorité : les classes les moins urgentes n'utilisent que le surplus.
+
+# Intervalle par défaut pour un match en cours (en secondes)
+LIVE_INTERVAL = 1
+
+# Fenêtre avant le coup d'envoi pendant laquelle un match est considéré comme proche
+NEAR_KICKOFF_WINDOW = 3600
+
+# Intervalle pour un match proche du coup d'envoi (en secondes)
+NEAR_KICKOFF_INTERVAL = 30
+
+# Intervalle pour un match lointain (en secondes)
+DISTANT_INTERVAL = 600
+
+# Retard (en secondes) au-delà duquel un match en cours est signalé comme en retard
+LIVE_LAG_WARNING = 5
+
+# Intervalle minimal (en secondes) entre deux avertissements de retard
+LAG_WARNING_INTERVAL = 30
+
+# Classes de priorité du budget (0 : la plus urgente)
+PRIORITY_SCHEDULED_EVENTS = 0
+PRIORITY_LIVE_INCIDENTS = 1
+PRIORITY_LIVE_ODDS = 2
+PRIORITY_PREMATCH_ODDS = 3
+PRIORITY_LINEUPS = 4
+PRIORITY_DAY_FETCHES = 5
+
+# Part du seau réservée aux classes plus urgentes, par niveau de priorité
+PRIORITY_RESERVE = 0.1
+
+
+# Seau à jetons partagé : limite le nombre de requêtes lancées par seconde.
+# Une requête de priorité p n'est acceptée que s'il reste, après elle, la réserve
+# des p classes plus urgentes (utilisable depuis la boucle asyncio comme depuis un thread).
+class RequestBudget:
+    def __init__(self, rate=MAX_REQUESTS_PER_SECOND, burst=REQUEST_BURST, reserve=PRIORITY_RESERVE):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.reserve = reserve
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Consommer un jeton si possible
+    def try_acquire(self, priority=PRIORITY_SCHEDULED_EVENTS):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1 + priority * self.reserve * self.burst:
+                self._tokens -= 1
+                return True
+            return False
+
+
+# Budget partagé par les pollers du processus. En mode réparti (POLL_SHARDS), il reste unique :
+# les processus de travail ajoutent du CPU, pas de quota amont (le coordinateur planifie tout)
+request_budget = RequestBudget()
+
+
+# Convertir le champ "startTime" ("%Y-%m-%d %H:%M:%S", heure locale) en timestamp
+def parse_start_time(start_time):
+    try:
+        return datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# Intervalle de rafraîchissement d'un match (None : ne plus l'interroger)
+def poll_interval(status, start_timestamp, now, live_interval=LIVE_INTERVAL):
+    if status == "inprogress":
+        return live_interval
+    if status == "notstarted":
+        if start_timestamp is not None and start_timestamp - now <= NEAR_KICKOFF_WINDOW:
+            return NEAR_KICKOFF_INTERVAL
+        return DISTANT_INTERVAL
+    return None
+
+
+class PollScheduler:
+    def __init__(self, live_interval=LIVE_INTERVAL, budget=None, priorities=None):
+        self.live_interval = live_interval
+        self.budget = budget if budget is not None else request_budget
+        # Priorité des requêtes selon le statut du match
+        self.priorities = priorities or {}
+        self._top_priority = min(self.priorities.values(), default=PRIORITY_SCHEDULED_EVENTS)
+        self._heap = []
+        # match_id -> [échéance, statut, startTime, timestamp du coup d'envoi]
+        self._entries = {}
+        self._last_lag_warning = 0.0
+
+    # Suivre un match nouveau ou modifié (statut, coup d'envoi) ; il est retiré
+    # s'il ne doit plus être interrogé
+    def update(self, match, now=None):
+        match_id = match["id"]
+        status = match.get("status")
+        start_time = match.get("startTime")
+
+        entry = self._entries.get(match_id)
+        if entry is not None and entry[1] == status and entry[2] == start_time:
+            return
+
+        now = time.time() if now is None else now
+        start_timestamp = entry[3] if entry is not None and entry[2] == start_time else parse_start_time(start_time)
+        if poll_interval(status, start_timestamp, now, self.live_interval) is None:
+            self._entries.pop(match_id, None)
+            return
+
+        # Nouveau match ou changement de statut : l'interroger dès que possible
+        self._entries[match_id] = [now, status, start_time, start_timestamp]
+        heapq.heappush(self._heap, (now, match_id))
+
+    # Ne plus interroger un match (son entrée dans le tas devient obsolète)
+    def remove(self, match_id):
+        self._entries.pop(match_id, None)
+
+    # Nombre de matchs dont l'échéance est atteinte (hors budget) ; parcourt tous les matchs suivis,
+    # les pollers ne le calculent que lorsque leur disjoncteur retient des requêtes
+    def pending(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for entry in self._entries.values() if entry[0] <= now)
+
+    # Matchs dont l'échéance est atteinte, dans la limite du budget de requêtes
+    # (et d'au plus `limit` matchs, par exemple une seule requête de test d'un circuit)
+    def due(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        due_ids = []
+        deferred = []
+        # Matchs en cours interrogés (ou reportés) avec plus de LIVE_LAG_WARNING secondes de retard
+        late = 0
+        max_lag = 0.0
+        while self._heap and self._heap[0][0] <= now:
+            if limit is not None and len(due_ids) >= limit:
+                break
+            due_at, match_id = heapq.heappop(self._heap)
+            entry = self._entries.get(match_id)
+            # Entrée obsolète (match retiré ou replanifié)
+            if entry is None or entry[0] != due_at:
+                continue
+            if entry[1] == "inprogress" and now - due_at > LIVE_LAG_WARNING:
+                late += 1
+                max_lag = max(max_lag, now - due_at)
+
+            # Budget épuisé pour cette classe : le match reste dû au prochain cycle
+            priority = self.priorities.get(entry[1], PRIORITY_SCHEDULED_EVENTS)
+            if not self.budget.try_acquire(priority):
+                deferred.append((due_at, match_id))
+                if priority == self._top_priority:
+                    break
+                continue
+
+            # Planifier la prochaine échéance selon le statut et la proximité du coup d'envoi
+            interval = poll_interval(entry[1], entry[3], now, self.live_interval)
+            entry[0] = now + interval
+            heapq.heappush(self._heap, (entry[0], match_id))
+            due_ids.append(match_id)
+
+        for item in deferred:
+            heapq.heappush(self._heap, item)
+
+        if late and time.monotonic() - self._last_lag_warning > LAG_WARNING_INTERVAL:
+            self._last_lag_warning = time.monotonic()
+            logging.warning(
+                f"{late} match(s) en cours interrogé(s) avec jusqu'à {max_lag:.1f}s de retard "
+                f"(budget de {self.budget.rate:g} requêtes/s, voir MAX_REQUESTS_PER_SECOND)"
+            )
+        return due_ids
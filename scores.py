@@ -1,18 +1,32 @@
 import json
 import time
 import asyncio
-import aiohttp
-from flask import Flask, jsonify
-from threading import Thread
+from functools import lru_cache
+from aiohttp import web
+from client import client
+from config import API_BASE, POLL_SHARDS
+from snapshot import foot_store, scores_store
+from circuit import breakers
+from scheduler import PRIORITY_LIVE_ODDS, PRIORITY_PREMATCH_ODDS, PollScheduler
+from odds_history import OddsHistory
+from odds_analytics import analytics
+from match_events import MatchTracker
+from metrics import LoopTimer
+from storage import storage
+from shards import shard_pool
+from capture import recorder
+from responses import json_error, query_number, snapshot_response
 
 # Configuration du logger pour enregistrer les erreurs
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Création de l'application Flask
-app = Flask(__name__)
+# Routes HTTP du module (servies par server.py)
+routes = web.RouteTableDef()
 
 # Fonction pour convertir une cote fractionnelle en décimale
+# (mémoïsée : les mêmes fractions reviennent pour tous les matchs, à chaque tick)
+@lru_cache(maxsize=4096)
 def fractional_to_decimal(fractional_value):
     try:
         numerator, denominator = map(int, fractional_value.split('/'))
@@ -21,37 +35,35 @@ def fractional_to_decimal(fractional_value):
         print(f"Erreur de conversion de la cote {fractional_value}: {e}")
         return None
 
-# Fonction pour décoder les chaînes contenant des séquences Unicode échappées
-def decode_unicode_string(input_string):
-    try:
-        return input_string.encode('utf-8').decode('unicode_escape')
-    except Exception as e:
-        print(f"Erreur de décodage de la chaîne : {e}")
-        return input_string
+# Fonction pour extraire les cotes 1/X/2 d'une réponse de l'API
+def extract_odds(data):
+    odds = {}
+
+    if 'featured' in data:
+        featured_data = data['featured']
+        if 'default' in featured_data:
+            choices = featured_data['default']['choices']
+            for choice in choices:
+                if choice['name'] == '1':
+                    odds['1'] = fractional_to_decimal(choice['fractionalValue'])
+                elif choice['name'] == 'X':
+                    odds['X'] = fractional_to_decimal(choice['fractionalValue'])
+                elif choice['name'] == '2':
+                    odds['2'] = fractional_to_decimal(choice['fractionalValue'])
+
+    return odds
 
 # Fonction asynchrone pour récupérer les cotes d'un match via l'API
 async def get_odds_for_match(session, match_id):
-    url = f"https://www.sofascore.com/api/v1/event/{match_id}/odds/1/featured"
+    url = f"{API_BASE}/event/{match_id}/odds/1/featured"
     
     try:
-        async with session.get(url) as response:
+        async with session.get(url, endpoint="odds") as response:
+            body = await response.read()
+            if recorder is not None:
+                recorder.record("odds", match_id, response.status, body, url)
             if response.status == 200:
-                data = await response.json()
-                odds = {}
-
-                if 'featured' in data:
-                    featured_data = data['featured']
-                    if 'default' in featured_data:
-                        choices = featured_data['default']['choices']
-                        for choice in choices:
-                            if choice['name'] == '1':
-                                odds['1'] = fractional_to_decimal(choice['fractionalValue'])
-                            elif choice['name'] == 'X':
-                                odds['X'] = fractional_to_decimal(choice['fractionalValue'])
-                            elif choice['name'] == '2':
-                                odds['2'] = fractional_to_decimal(choice['fractionalValue'])
-                
-                return odds
+                return extract_odds(json.loads(body))
             else:
                 print(f"Erreur lors de la récupération des données pour le match {match_id}. Code: {response.status}")
                 return None
@@ -59,85 +71,158 @@ async def get_odds_for_match(session, match_id):
         print(f"Erreur lors de la requête pour le match {match_id}: {e}")
         return None
 
-# Fonction pour filtrer et sauvegarder les matchs avec leurs cotes
+# Planificateur : fréquence de rafraîchissement des cotes selon le statut et le coup d'envoi
+scheduler = PollScheduler(live_interval=1, priorities={
+    "inprogress": PRIORITY_LIVE_ODDS,
+    "notstarted": PRIORITY_PREMATCH_ODDS
+})
+
+# Disjoncteur de l'endpoint des cotes
+breaker = breakers["odds"]
+
+# Dernières cotes connues par match
+odds_by_match = {}
+
+# Historique des variations de cotes
+odds_history = OddsHistory()
+
+# Matchs en cours et à venir, tenus à jour par les transitions diffusées par foot.py
+tracker = MatchTracker(statuses=("inprogress", "notstarted"))
+
+# Fonction pour rafraîchir et sauvegarder les cotes des matchs suivis
 async def filter_and_save_matches():
-    with open('foot.json', 'r', encoding='utf-8') as file:
-        data = json.load(file)
+    # Appliquer les transitions : seuls les matchs nouveaux, modifiés ou sortis sont traités
+    changes = tracker.refresh(foot_store.current())
+    matches = tracker.matches
+    for match_id in changes.stopped:
+        scheduler.remove(match_id)
+        odds_by_match.pop(match_id, None)
+    for match in (*changes.started.values(), *changes.updated.values()):
+        scheduler.update(match)
+
+    # Premier lot après un démarrage à chaud : oublier les cotes reprises des matchs qui ne sont plus suivis
+    if changes.initial:
+        for match_id in [match_id for match_id in odds_by_match if match_id not in matches]:
+            del odds_by_match[match_id]
+    if analytics is not None and (changes.stopped or changes.initial):
+        analytics.retain(matches)
+
+    # Endpoint suspendu : aucune requête, le dernier snapshot publié reste servi
+    permitted = breaker.permits(scheduler.pending)
+    if permitted == 0:
+        return
+
+    # Ne rafraîchir que les matchs dont l'échéance est atteinte
+    due_ids = scheduler.due(limit=permitted)
+    if not due_ids:
+        return
+
+    # Client HTTP partagé : connexions conservées d'un cycle à l'autre
+    # (en mode réparti, chaque processus traite les matchs qui lui reviennent)
+    if POLL_SHARDS:
+        results = await shard_pool().map("odds", due_ids)
+    else:
+        session = client
+        results = await asyncio.gather(*(get_odds_for_match(session, match_id) for match_id in due_ids))
+    now = time.time()
+    odds_ticks = []
+    for match_id, odds in zip(due_ids, results):
+        if odds:
+            odds_by_match[match_id] = odds
+            if odds_history.record(match_id, odds, now):
+                odds_ticks.append((match_id, now, odds))
+
+    # Analyses vectorisées de tous les matchs suivis
+    if analytics is not None:
+        analytics.update(
+            [(match_id, odds, matches[match_id]["status"] == "inprogress") for match_id, odds in zip(due_ids, results) if odds],
+            now
+        )
+
+    # Une seule écriture SQLite par cycle, limitée aux cotes qui ont changé
+    if storage is not None and odds_ticks:
+        storage.write_cycle(odds_ticks=odds_ticks)
+
+    # Ni cote modifiée ni transition : le snapshot publié est toujours à jour
+    if not odds_ticks and not changes and scores_store.data() is not None:
+        return
 
     inprogress_matches = []
     notstarted_matches = []
 
-    async with aiohttp.ClientSession() as session:
-
-        async def filter_matches(matches, status):
-            tasks = []
-            for match in matches:
-                if isinstance(match, dict):
-                    if match.get("status") == status:
-                        match_id = match["id"]
-                        task = get_odds_for_match(session, match_id)
-                        tasks.append(task)
-            
-            results = await asyncio.gather(*tasks)
-            
-            for idx, match in enumerate(matches):
-                if isinstance(match, dict) and match.get("status") == status and results[idx]:
-                    match_data = {
-                        "homeTeam": decode_unicode_string(match["homeTeam"]),
-                        "awayTeam": decode_unicode_string(match["awayTeam"]),
-                        "id": match["id"],
-                        "odds": results[idx]
-                    }
-                    if status == "inprogress":
-                        inprogress_matches.append(match_data)
-                    elif status == "notstarted":
-                        notstarted_matches.append(match_data)
-
-        if isinstance(data, list):
-            await filter_matches(data, "inprogress")
-            await filter_matches(data, "notstarted")
-
-        if "ongoing" in data:
-            await filter_matches(data["ongoing"], "inprogress")
-
-        if "upcoming" in data:
-            await filter_matches(data["upcoming"], "notstarted")
+    for match_id, odds in odds_by_match.items():
+        match = matches.get(match_id)
+        if match is None:
+            continue
+        match_data = {
+            "homeTeam": match["homeTeam"],
+            "awayTeam": match["awayTeam"],
+            "id": match_id,
+            "odds": odds
+        }
+        if match["status"] == "inprogress":
+            inprogress_matches.append(match_data)
+        elif match["status"] == "notstarted":
+            notstarted_matches.append(match_data)
 
     if inprogress_matches or notstarted_matches:
-        with open('scores.json', 'w', encoding='utf-8') as file:
-            json.dump({
-                "inprogress": inprogress_matches,
-                "notstarted": notstarted_matches
-            }, file, ensure_ascii=False, indent=4)  # `ensure_ascii=False` pour conserver les caractères spéciaux
-        print("Les matchs avec leurs cotes ont été enregistrés dans scores.json.")
+        # Sérialisation et point de sauvegarde hors de la boucle asyncio
+        await asyncio.to_thread(scores_store.publish, {
+            "inprogress": inprogress_matches,
+            "notstarted": notstarted_matches
+        })
+        print(f"Cotes rafraîchies pour {len(due_ids)} match(s), {len(odds_by_match)} match(s) publiés.")
     else:
         print("Aucun match correspondant n'a été trouvé.")
 
+# État conservé d'un redémarrage à l'autre (voir state_checkpoint.py)
+def dump_state():
+    return {"odds_by_match": dict(odds_by_match), "odds_history": odds_history.dump()}
+
+def restore_state(state):
+    for match_id, odds in state["odds_by_match"].items():
+        odds_by_match.setdefault(match_id, odds)
+    odds_history.load(state["odds_history"])
+
 # Fonction principale pour exécuter la boucle asynchrone
 async def main():
+    cycle_timer = LoopTimer("scores", 1)
     while True:
-        await filter_and_save_matches()
+        with cycle_timer:
+            await filter_and_save_matches()
+        stats = client.stats()
+        print(f"Pool HTTP: {stats['requests']} requêtes, {stats['connections_reused']} connexions réutilisées, attente moyenne {stats['queue_wait_avg']:.3f}s")
         await asyncio.sleep(1)  # Pause de 1 seconde avant la prochaine itération
 
-# Route Flask pour récupérer les matchs en cours avec leurs cotes
-@app.route('/live_matches', methods=['GET'])
-def get_live_matches():
-    try:
-        with open('scores.json', 'r', encoding='utf-8') as file:
-            live_matches = json.load(file)
-        return jsonify(live_matches)
-    except Exception as e:
-        print(f"Erreur lors de la récupération des matchs en direct: {e}")
-        return jsonify({"error": "Could not fetch live matches"}), 500
-
-# Fonction pour lancer Flask sur le port 10000
-def run_flask():
-    app.run(host='0.0.0.0', port=10000)  # Lancer Flask sur le port 10000
-
+# Route pour récupérer les matchs en cours avec leurs cotes
+@routes.get('/live_matches')
+async def get_live_matches(request):
+    return snapshot_response(request, scores_store.current(), "Could not fetch live matches", 500)
+
+# Route pour récupérer l'historique des cotes d'un match
+@routes.get(r'/odds/{match_id:\d+}/history')
+async def get_odds_history(request):
+    match_id = int(request.match_info['match_id'])
+    history = odds_history.history(match_id, since=query_number(request, 'since', type=float))
+    if history is None:
+        return json_error("Match not found", 404)
+    return web.json_response({"id": match_id, "history": history})
+
+# Route pour récupérer les plus fortes variations de cotes sur une fenêtre (en secondes)
+@routes.get('/odds/movers')
+async def get_odds_movers(request):
+    window = query_number(request, 'window', 600)
+    limit = query_number(request, 'limit', 20)
+    return web.json_response({"window": window, "movers": odds_history.movers(window, limit)})
+
+# Route pour récupérer les analyses des cotes (probabilités, marge, cotes équitables, variations)
+@routes.get('/odds/analytics')
+async def get_odds_analytics(request):
+    if analytics is None:
+        return json_error("Odds analytics require numpy", 503)
+    return snapshot_response(request, analytics.snapshot(), "No odds available yet")
+
+# Lancer uniquement ce module (routes et boucle) dans le serveur commun
 if __name__ == "__main__":
-    # Démarrer Flask dans un thread séparé pour ne pas bloquer la boucle asynchrone
-    flask_thread = Thread(target=run_flask)
-    flask_thread.start()
-
-    # Lancer la boucle principale en mode asynchrone pour traiter les matchs
-    asyncio.run(main())
+    import server
+    server.main(["scores"])
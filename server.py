@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+from aiohttp import web
+import metrics
+from client import client
+from snapshot import STORES
+from storage import storage, routes as storage_routes
+from capture import recorder
+import shards
+import state_checkpoint
+from config import STATE_PATH
+
+# Serveur unique : un seul processus et une seule boucle asyncio hébergent
+# les routes de tous les modules et leurs boucles de rafraîchissement.
+# Chaque boucle est supervisée (redémarrage automatique après un plantage)
+# et l'arrêt (SIGINT/SIGTERM) annule proprement les boucles, ferme le client HTTP
+# et écrit un dernier point de sauvegarde des snapshots et de l'état (state_checkpoint.py),
+# repris au démarrage suivant.
+# Les métriques Prometheus de l'ensemble du processus sont exposées sur /metrics.
+
+# Adresse d'écoute (Render fournit le port dans la variable PORT)
+HOST = "0.0.0.0"
+PORT = int(os.environ.get("PORT", 10000))
+
+# Modules hébergés : chacun expose `routes` et une coroutine `main()`
+MODULES = ["foot", "scores", "incidents", "classements"]
+
+# Délai avant redémarrage d'une boucle plantée (doublé à chaque échec consécutif)
+RESTART_DELAY = 1
+MAX_RESTART_DELAY = 60
+
+# Durée au-delà de laquelle une boucle est considérée stable (remise à zéro du délai)
+STABLE_RUN = 60
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# Exécuter une boucle et la relancer après un arrêt inattendu
+async def supervise(name, main):
+    delay = RESTART_DELAY
+    while True:
+        started = time.monotonic()
+        try:
+            await main()
+            logging.warning(f"La boucle {name} s'est arrêtée, redémarrage dans {delay}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception(f"La boucle {name} a planté, redémarrage dans {delay}s")
+
+        if time.monotonic() - started > STABLE_RUN:
+            delay = RESTART_DELAY
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RESTART_DELAY)
+
+
+# Démarrer les boucles au lancement du serveur et les arrêter proprement à la fermeture
+def pollers_context(modules):
+    async def pollers(app):
+        # Démarrage à chaud : état et snapshots repris avant le premier cycle des boucles
+        state_checkpoint.restore(modules)
+        tasks = [
+            asyncio.create_task(supervise(module.__name__, module.main), name=module.__name__)
+            for module in modules
+        ]
+        if STATE_PATH:
+            tasks.append(asyncio.create_task(state_checkpoint.run(modules), name="state_checkpoint"))
+        yield
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await client.close()
+        shards.shutdown()
+        for module in modules:
+            for name in ("fetcher", "day_fetcher"):
+                fetcher = getattr(module, name, None)
+                if fetcher is not None:
+                    fetcher.shutdown()
+        for store in STORES:
+            store.checkpoint()
+        state_checkpoint.save(modules)
+        if storage is not None:
+            storage.close()
+        if recorder is not None:
+            recorder.close()
+        logging.info("Serveur arrêté proprement.")
+
+    return pollers
+
+
+# Construire l'application avec les routes et (sauf pollers=False) les boucles des modules demandés
+def create_app(module_names=MODULES, pollers=True):
+    modules = [importlib.import_module(name) for name in module_names]
+    app = web.Application(middlewares=[metrics.route_metrics_middleware])
+    app.add_routes(metrics.routes)
+    if storage is not None:
+        app.add_routes(storage_routes)
+    for module in modules:
+        app.add_routes(module.routes)
+    if pollers:
+        app.cleanup_ctx.append(pollers_context(modules))
+    return app
+
+
+def main(module_names=MODULES):
+    web.run_app(create_app(module_names), host=HOST, port=PORT)
+
+
+if __name__ == "__main__":
+    main()
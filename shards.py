@@ -0,0 +1,234 @@
+import time
+import atexit
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import POLL_SHARDS
+from circuit import breakers
+
+# Mode réparti des requêtes par match (activé par POLL_SHARDS=N, N processus).
+# Les ids de match sont répartis entre les processus par hachage cohérent ; chaque
+# processus a sa propre boucle asyncio et son propre pool de connexions, et y exécute
+# les requêtes et l'extraction (décodage JSON, incidents, lineups) de son lot.
+# Le processus principal reste coordinateur : il planifie (budget et disjoncteurs partagés),
+# fusionne les résultats des lots puis publie les snapshots. Si un processus meurt, il est
+# retiré de l'anneau (ses matchs passent aux voisins), son lot est relancé, et un processus
+# de remplacement rejoint l'anneau après RESTART_DELAY secondes.
+
+# Points virtuels par processus sur l'anneau
+REPLICAS = 64
+
+# Délai avant le remplacement d'un processus mort (en secondes)
+RESTART_DELAY = 1
+
+# Nombre maximal de tentatives d'un lot après la mort de processus
+MAX_ATTEMPTS = 3
+
+# Fonction de récupération de chaque type de requête : (module, fonction)
+FETCHERS = {
+    "odds": ("scores", "get_odds_for_match"),
+    "incidents": ("incidents", "get_incidents_for_match"),
+    "lineups": ("classements", "get_lineup_data")
+}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Anneau de hachage cohérent : le retrait d'un nœud ne déplace que ses propres clés
+class HashRing:
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._nodes))
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = _hash(f"{node}:{replica}")
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        kept = [(point, owner) for point, owner in zip(self._points, self._nodes) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._nodes = [owner for _, owner in kept]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+# --- Côté processus de travail ---
+
+_worker_loop = None
+
+
+# Initialisation d'un processus de travail : Ctrl-C ne concerne que le coordinateur, qui
+# arrête les processus ; le client HTTP est fermé proprement à la sortie du processus
+def init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    atexit.register(_close_worker)
+
+
+def _close_worker():
+    if _worker_loop is None:
+        return
+    from client import client
+    _worker_loop.run_until_complete(client.close())
+    _worker_loop.close()
+
+
+# Exécuter un lot dans le processus de travail (boucle et pool de connexions conservés entre les lots).
+# Renvoie les résultats alignés sur `match_ids` et la durée restante de suspension de l'endpoint.
+def run_batch(kind, match_ids, cached=None):
+    global _worker_loop
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(_fetch_batch(kind, match_ids, cached))
+
+
+async def _fetch_batch(kind, match_ids, cached):
+    from client import client
+    module_name, function_name = FETCHERS[kind]
+    fetch = getattr(importlib.import_module(module_name), function_name)
+    breaker = breakers[kind]
+
+    # Disjoncteur propre au processus : endpoint suspendu ici, ou une seule requête de test
+    permitted = breaker.permits(len(match_ids))
+    count = len(match_ids) if permitted is None else min(permitted, len(match_ids))
+    if cached is None:
+        requests = (fetch(client, match_id) for match_id in match_ids[:count])
+    else:
+        requests = (fetch(client, match_id, previous) for match_id, previous in zip(match_ids[:count], cached))
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    return (
+        [None if isinstance(result, BaseException) else result for result in results] + [None] * (len(match_ids) - count),
+        max(0.0, breaker.blocked_until - time.monotonic())
+    )
+
+
+# --- Côté coordinateur ---
+
+class ShardPool:
+    def __init__(self, count):
+        self._context = multiprocessing.get_context("spawn")
+        self._names = [f"shard-{index}" for index in range(count)]
+        self._workers = {}
+        self._ring = HashRing()
+        for name in self._names:
+            self._start(name)
+
+    def _start(self, name):
+        if name in self._workers:
+            return
+        self._workers[name] = ProcessPoolExecutor(max_workers=1, mp_context=self._context, initializer=init_worker)
+        self._ring.add(name)
+        logging.info(f"Processus {name} ajouté à l'anneau ({len(self._ring)} actif(s))")
+
+    # Retirer un processus mort de l'anneau et planifier son remplacement
+    def _replace(self, name):
+        executor = self._workers.pop(name, None)
+        if executor is None:
+            return
+        self._ring.remove(name)
+        executor.shutdown(wait=False, cancel_futures=True)
+        logging.warning(f"Processus {name} arrêté, ses matchs sont répartis sur {len(self._ring)} processus")
+        if not self._ring:
+            self._start(name)
+        else:
+            asyncio.get_running_loop().call_later(RESTART_DELAY, self._start, name)
+
+    # Soumettre un lot ; un pool déjà cassé échoue ici plutôt qu'à la soumission
+    def _submit(self, name, kind, match_ids, cached):
+        try:
+            future = self._workers[name].submit(run_batch, kind, match_ids, cached)
+        except BrokenProcessPool as e:
+            future = asyncio.get_running_loop().create_future()
+            future.set_exception(e)
+            return future
+        return asyncio.wrap_future(future)
+
+    # Répartition des ids entre les processus de l'anneau
+    def _group(self, match_ids):
+        groups = {}
+        for match_id in match_ids:
+            groups.setdefault(self._ring.node_for(match_id), []).append(match_id)
+        return groups
+
+    # Exécuter un type de requête pour tous les ids ; résultats alignés sur `match_ids`
+    # (None en cas d'échec). `cached` : valeur précédente par id, transmise à la fonction.
+    async def map(self, kind, match_ids, cached=None):
+        results = {}
+        pending = self._group(match_ids)
+        breaker = breakers[kind]
+        for _ in range(MAX_ATTEMPTS):
+            names = list(pending)
+            futures = [
+                self._submit(
+                    name, kind, pending[name],
+                    [cached.get(match_id) for match_id in pending[name]] if cached is not None else None
+                )
+                for name in names
+            ]
+            outcomes = await asyncio.gather(*futures, return_exceptions=True)
+
+            retry = []
+            for name, outcome in zip(names, outcomes):
+                if isinstance(outcome, BrokenProcessPool):
+                    self._replace(name)
+                    retry.extend(pending[name])
+                elif isinstance(outcome, BaseException):
+                    logging.error(f"Erreur du processus {name} ({kind}): {outcome}")
+                else:
+                    batch, blocked_for = outcome
+                    results.update(zip(pending[name], batch))
+                    # Le disjoncteur du coordinateur reflète l'état observé par les processus
+                    if blocked_for > 0:
+                        breaker.record_failure(retry_after=blocked_for)
+                    else:
+                        breaker.record_success()
+            if not retry:
+                break
+            pending = self._group(retry)
+        return [results.get(match_id) for match_id in match_ids]
+
+    # Arrêter les processus : les lots en attente sont annulés, chaque processus termine
+    # son lot en cours puis ferme son client HTTP avant de sortir
+    def shutdown(self):
+        for executor in self._workers.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        for executor in self._workers.values():
+            executor.shutdown(wait=True)
+        self._workers.clear()
+
+
+_pool = None
+
+
+# Pool partagé, créé au premier appel (uniquement dans le coordinateur)
+def shard_pool():
+    global _pool
+    if _pool is None:
+        _pool = ShardPool(POLL_SHARDS)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
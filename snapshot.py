@@ -0,0 +1,209 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from config import MAX_STATE_AGE
+from metrics import CallbackGauge, snapshot_serialization
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Magasin de snapshots partagé en mémoire.
+# Le pipeline de récupération publie un nouvel objet complet à chaque cycle
+# (échange atomique de la référence) ; les lecteurs (pollers, routes) récupèrent
+# le snapshot courant sans accès disque ni re-parsing. Les fichiers JSON ne sont
+# plus que des points de sauvegarde périodiques, écrits de façon atomique.
+# Chaque snapshot n'est sérialisé qu'une fois (JSON compact, variantes gzip et brotli,
+# un ETag fort par codage) ; les routes servent directement ces octets.
+
+# Niveaux de compression des variantes pré-calculées
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Suffixe de l'ETag de chaque variante compressée (un validateur fort par codage, RFC 9110)
+ETAG_SUFFIXES = {"gzip": "-gz", "br": "-br"}
+
+
+# Sérialiser les enregistrements compacts (ex. decoder.Match) qui exposent to_dict()
+def _to_json(obj):
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
+
+
+# Corps de réponse pré-sérialisé d'un snapshot
+class EncodedBody:
+    __slots__ = ("body", "gzip", "brotli", "etag")
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_to_json).encode("utf-8")
+        self.gzip = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+        self.brotli = brotli.compress(self.body, quality=BROTLI_QUALITY) if brotli is not None else None
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+
+    # ETag de la variante servie (`encoding` : None, "gzip" ou "br")
+    def etag_for(self, encoding=None):
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}{ETAG_SUFFIXES[encoding]}"'
+
+
+# Snapshot immuable : une version, une date de publication et les données.
+# Les données publiées ne doivent plus être modifiées après la publication.
+class Snapshot:
+    __slots__ = ("version", "published_at", "data", "store_name", "from_checkpoint", "_encoded")
+
+    def __init__(self, version, published_at, data, store_name=None, from_checkpoint=False):
+        self.version = version
+        self.published_at = published_at
+        self.data = data
+        self.store_name = store_name
+        # Relu depuis un point de sauvegarde (et non publié par une boucle de ce processus)
+        self.from_checkpoint = from_checkpoint
+
+    # Sérialisation calculée au premier accès puis conservée
+    def encoded(self):
+        try:
+            return self._encoded
+        except AttributeError:
+            started = time.perf_counter()
+            encoded = EncodedBody(self.data)
+            snapshot_serialization.labels(self.store_name).observe(time.perf_counter() - started)
+            object.__setattr__(self, "_encoded", encoded)
+            return encoded
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("Snapshot is immutable")
+        object.__setattr__(self, name, value)
+
+
+class SnapshotStore:
+    def __init__(self, name, checkpoint_path=None, checkpoint_interval=10):
+        self.name = name
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._published_locally = False
+        self._checkpointed_version = 0
+        self._last_checkpoint = 0.0
+        self._checkpoint_mtime = None
+
+    # Publier de nouvelles données : construction et sérialisation du snapshot, échange atomique,
+    # puis point de sauvegarde éventuel. Sérialisation et écriture sont coûteuses : depuis une
+    # boucle asyncio, publish() s'appelle dans un thread (asyncio.to_thread).
+    def publish(self, data):
+        with self._lock:
+            self._version += 1
+            version = self._version
+        snapshot = Snapshot(version, time.time(), data, self.name)
+        snapshot.encoded()
+        with self._lock:
+            self._snapshot = snapshot
+            self._published_locally = True
+        self.maybe_checkpoint()
+        return snapshot
+
+    # Lire le snapshot courant (None si rien n'a encore été publié)
+    def current(self):
+        if not self._published_locally and self.checkpoint_path:
+            self._reload_checkpoint()
+        return self._snapshot
+
+    # Raccourci pour obtenir directement les données du snapshot courant
+    def data(self, default=None):
+        snapshot = self.current()
+        return snapshot.data if snapshot is not None else default
+
+    # Écrire le point de sauvegarde si l'intervalle est écoulé et que la version a changé
+    def maybe_checkpoint(self):
+        if not self.checkpoint_path:
+            return False
+        if time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return False
+        return self.checkpoint()
+
+    # Écriture atomique du snapshot courant : fichier temporaire puis os.replace
+    def checkpoint(self):
+        snapshot = self._snapshot
+        # Un snapshot relu depuis le point de sauvegarde n'a pas besoin d'y être réécrit
+        if snapshot is None or not self.checkpoint_path or not self._published_locally:
+            return False
+        if snapshot.version == self._checkpointed_version:
+            return False
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(snapshot.encoded().body)
+            os.replace(tmp_path, self.checkpoint_path)
+        except OSError as e:
+            logging.error(f"Erreur lors de l'écriture de {self.checkpoint_path}: {e}")
+            return False
+        self._checkpointed_version = snapshot.version
+        self._last_checkpoint = time.monotonic()
+        return True
+
+    # Sans publication locale (autre processus), recharger le point de sauvegarde
+    # uniquement lorsque le fichier a changé sur le disque. Un point de sauvegarde plus
+    # ancien que MAX_STATE_AGE (date de modification) est ignoré.
+    def _reload_checkpoint(self):
+        try:
+            mtime = os.stat(self.checkpoint_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._checkpoint_mtime:
+            return
+        with self._lock:
+            if self._published_locally or mtime == self._checkpoint_mtime:
+                return
+            age = time.time() - mtime / 1e9
+            if age > MAX_STATE_AGE:
+                logging.warning(f"Point de sauvegarde {self.checkpoint_path} trop ancien ({age:.0f}s), ignoré")
+                self._checkpoint_mtime = mtime
+                return
+            try:
+                with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Erreur lors de la lecture de {self.checkpoint_path}: {e}")
+                return
+            self._version += 1
+            self._snapshot = Snapshot(self._version, mtime / 1e9, data, self.name, from_checkpoint=True)
+            self._checkpoint_mtime = mtime
+
+
+# Magasins partagés par les différents modules
+foot_store = SnapshotStore("foot", "foot.json", checkpoint_interval=2)
+scores_store = SnapshotStore("scores", "scores.json")
+incidents_store = SnapshotStore("evenements", "evenements.json")
+classements_store = SnapshotStore("classements", "classements.json")
+
+STORES = (foot_store, scores_store, incidents_store, classements_store)
+
+
+# Âge et version des snapshots courants, calculés au moment de l'export des métriques
+def _snapshot_ages():
+    now = time.time()
+    for store in STORES:
+        snapshot = store.current()
+        if snapshot is not None:
+            yield (store.name,), now - snapshot.published_at
+
+
+def _snapshot_versions():
+    for store in STORES:
+        snapshot = store.current()
+        if snapshot is not None:
+            yield (store.name,), snapshot.version
+
+
+CallbackGauge("api_snapshot_age_seconds", "Seconds since the current snapshot was published", ["store"], _snapshot_ages)
+CallbackGauge("api_snapshot_version", "Version of the current snapshot", ["store"], _snapshot_versions)
@@ -0,0 +1,100 @@
+import os
+import time
+import pickle
+import asyncio
+import logging
+from config import MAX_STATE_AGE, STATE_PATH
+from snapshot import STORES
+
+# Point de reprise de l'état en mémoire des modules (démarrage à chaud).
+# Chaque module peut exposer dump_state() (copie de son état, prise dans la boucle asyncio)
+# et restore_state(state). L'ensemble est écrit périodiquement et à l'arrêt dans STATE_PATH
+# (pickle, fichier temporaire puis os.replace) ; au démarrage, il est relu avant le lancement
+# des boucles, et les snapshots sont rechargés depuis leurs points de sauvegarde JSON :
+# les routes répondent immédiatement, pendant que le premier cycle revalide les données.
+
+# Intervalle (en secondes) entre deux points de reprise
+STATE_INTERVAL = 30
+
+# Version du format (un point de reprise d'une autre version est ignoré)
+STATE_FORMAT = 1
+
+
+def _stateful(modules):
+    return [module for module in modules if hasattr(module, "dump_state")]
+
+
+# Copier l'état des modules ; à appeler depuis la boucle asyncio (aucune écriture concurrente)
+def collect(modules):
+    states = {}
+    for module in _stateful(modules):
+        try:
+            states[module.__name__] = module.dump_state()
+        except Exception as e:
+            logging.error(f"Erreur lors de la copie de l'état de {module.__name__}: {e}")
+    return {"format": STATE_FORMAT, "saved_at": time.time(), "modules": states}
+
+
+# Sérialiser et écrire un état collecté (peut s'exécuter dans un thread)
+def write(state, path=STATE_PATH):
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError) as e:
+        logging.error(f"Erreur lors de l'écriture du point de reprise {path}: {e}")
+        return False
+    logging.debug(f"Point de reprise écrit en {time.perf_counter() - started:.3f}s")
+    return True
+
+
+def save(modules, path=STATE_PATH):
+    if not path:
+        return False
+    return write(collect(modules), path)
+
+
+# Relire le point de reprise et les snapshots ; renvoie True si un état a été restauré
+def restore(modules, path=STATE_PATH):
+    started = time.perf_counter()
+    for store in STORES:
+        store.current()
+    if not path:
+        return False
+
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logging.error(f"Point de reprise {path} illisible, démarrage à froid: {e}")
+        return False
+    if state.get("format") != STATE_FORMAT:
+        logging.warning(f"Point de reprise {path} d'un autre format, ignoré")
+        return False
+    age = time.time() - state["saved_at"]
+    if age > MAX_STATE_AGE:
+        logging.warning(f"Point de reprise {path} trop ancien ({age:.0f}s), ignoré")
+        return False
+
+    for module in _stateful(modules):
+        module_state = state["modules"].get(module.__name__)
+        if module_state is None:
+            continue
+        try:
+            module.restore_state(module_state)
+        except Exception as e:
+            logging.error(f"Erreur lors de la reprise de l'état de {module.__name__}: {e}")
+    logging.info(f"État repris depuis {path} (âge {age:.0f}s) en {time.perf_counter() - started:.3f}s")
+    return True
+
+
+# Écrire un point de reprise toutes les `interval` secondes (copie dans la boucle, écriture dans un thread)
+async def run(modules, interval=STATE_INTERVAL, path=STATE_PATH):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(write, collect(modules), path)
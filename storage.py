@@ -0,0 +1,268 @@
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from config import SQLITE_PATH
+from responses import json_error, query_number
+
+# Stockage SQLite optionnel (activé par la variable d'environnement SQLITE_PATH).
+# Les boucles y versent, une fois par cycle et en une seule transaction, ce qui a changé :
+# matchs, points de cotes, incidents et joueurs des lineups. Les écritures passent par un
+# unique thread écrivain ; la base est en mode WAL, si bien que les lecteurs (routes
+# /history, connexions en lecture seule par thread) ne bloquent jamais l'écrivain.
+# Les fichiers JSON restent écrits comme exports des snapshots.
+
+# Nombre maximal de matchs renvoyés par /history/matches
+MAX_HISTORY_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    home_team TEXT,
+    away_team TEXT,
+    start_time TEXT,
+    season_id INTEGER,
+    tournament TEXT,
+    status TEXT,
+    home_score INTEGER,
+    away_score INTEGER,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS matches_status ON matches(status);
+CREATE INDEX IF NOT EXISTS matches_tournament ON matches(tournament);
+CREATE INDEX IF NOT EXISTS matches_season_id ON matches(season_id);
+CREATE INDEX IF NOT EXISTS matches_home_team ON matches(home_team);
+CREATE INDEX IF NOT EXISTS matches_away_team ON matches(away_team);
+CREATE INDEX IF NOT EXISTS matches_start_time ON matches(start_time);
+
+CREATE TABLE IF NOT EXISTS odds_ticks (
+    match_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    home REAL,
+    draw REAL,
+    away REAL,
+    PRIMARY KEY (match_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS incidents (
+    match_id INTEGER NOT NULL,
+    incident_key TEXT NOT NULL,
+    seq INTEGER,
+    incident_type TEXT,
+    time INTEGER,
+    team TEXT,
+    data TEXT,
+    PRIMARY KEY (match_id, incident_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS lineup_players (
+    match_id INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    player_id INTEGER,
+    name TEXT,
+    short_name TEXT,
+    position TEXT,
+    jersey_number TEXT,
+    is_substitute INTEGER,
+    statistics TEXT,
+    PRIMARY KEY (match_id, side, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lineup_players_player_id ON lineup_players(player_id);
+"""
+
+UPSERT_MATCH = """
+INSERT INTO matches (id, home_team, away_team, start_time, season_id, tournament, status, home_score, away_score, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    home_team = excluded.home_team, away_team = excluded.away_team, start_time = excluded.start_time,
+    season_id = excluded.season_id, tournament = excluded.tournament, status = excluded.status,
+    home_score = excluded.home_score, away_score = excluded.away_score, updated_at = excluded.updated_at
+"""
+
+INSERT_ODDS_TICK = "INSERT OR REPLACE INTO odds_ticks (match_id, ts, home, draw, away) VALUES (?, ?, ?, ?, ?)"
+
+INSERT_INCIDENT = """
+INSERT OR REPLACE INTO incidents (match_id, incident_key, seq, incident_type, time, team, data)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+DELETE_LINEUP = "DELETE FROM lineup_players WHERE match_id = ?"
+
+INSERT_LINEUP_PLAYER = """
+INSERT INTO lineup_players (match_id, side, slot, player_id, name, short_name, position, jersey_number, is_substitute, statistics)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+# Les ids "Unknown" des données de l'API ne sont pas stockés comme entiers
+def _integer(value):
+    return value if isinstance(value, int) else None
+
+
+class SQLiteStorage:
+    def __init__(self, path):
+        self.path = path
+        # Un seul thread écrivain : les cycles sont écrits dans l'ordre, sans verrou applicatif
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._readers = threading.local()
+        self._writer = None
+        self._executor.submit(self._open_writer).result()
+
+    def _open_writer(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        self._writer = connection
+
+    # Exécuter toutes les écritures d'un cycle dans une seule transaction
+    def _write(self, statements):
+        started = time.perf_counter()
+        try:
+            with self._writer:
+                for sql, rows in statements:
+                    self._writer.executemany(sql, rows)
+        except sqlite3.Error as e:
+            logging.error(f"Erreur lors de l'écriture dans {self.path}: {e}")
+            return
+        logging.debug(f"SQLite : {sum(len(rows) for _, rows in statements)} ligne(s) écrites en {time.perf_counter() - started:.3f}s")
+
+    # Soumettre les écritures d'un cycle à l'écrivain (sans attendre)
+    def write_cycle(self, matches=(), odds_ticks=(), incidents=(), lineups=()):
+        statements = []
+        now = time.time()
+        if matches:
+            statements.append((UPSERT_MATCH, [
+                (
+                    _integer(match["id"]), match["homeTeam"], match["awayTeam"], match["startTime"],
+                    _integer(match["seasonId"]), match["tournament"], match["status"],
+                    match["homeScore"], match["awayScore"], now
+                )
+                for match in matches if _integer(match["id"]) is not None
+            ]))
+        if odds_ticks:
+            statements.append((INSERT_ODDS_TICK, [
+                (match_id, int(timestamp), odds.get("1"), odds.get("X"), odds.get("2"))
+                for match_id, timestamp, odds in odds_ticks
+            ]))
+        if incidents:
+            statements.append((INSERT_INCIDENT, [
+                (
+                    incident["matchId"], json.dumps(key, ensure_ascii=False), incident.get("seq"),
+                    incident.get("incidentType"), incident.get("time"), incident.get("team"),
+                    json.dumps(incident, ensure_ascii=False)
+                )
+                for key, incident in incidents
+            ]))
+        if lineups:
+            statements.append((DELETE_LINEUP, [(lineup["matchId"],) for lineup in lineups]))
+            statements.append((INSERT_LINEUP_PLAYER, [
+                (
+                    lineup["matchId"], side, slot, player.get("id"), player.get("name"), player.get("shortName"),
+                    player.get("position"), player.get("jerseyNumber"), int(bool(player.get("isSubstitute"))),
+                    json.dumps(player.get("statistics", {}), ensure_ascii=False)
+                )
+                for lineup in lineups
+                for side in ("homeTeam", "awayTeam")
+                for slot, player in enumerate(lineup[side])
+            ]))
+        if statements:
+            return self._executor.submit(self._write, statements)
+        return None
+
+    # Connexion en lecture seule propre au thread appelant
+    def _reader(self):
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            connection.row_factory = sqlite3.Row
+            self._readers.connection = connection
+        return connection
+
+    def query(self, sql, params=()):
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    # Requête de lecture depuis la boucle asyncio (exécutée dans un thread)
+    async def fetch(self, sql, params=()):
+        return await asyncio.to_thread(self.query, sql, params)
+
+    # Terminer les écritures en attente puis fermer la connexion d'écriture (dans son thread)
+    def close(self):
+        if self._writer is not None:
+            self._executor.submit(self._close_writer)
+        self._executor.shutdown(wait=True)
+
+    def _close_writer(self):
+        self._writer.close()
+        self._writer = None
+
+
+# Stockage partagé (None si SQLITE_PATH n'est pas défini)
+storage = SQLiteStorage(SQLITE_PATH) if SQLITE_PATH else None
+
+# Routes de lecture de l'historique (ajoutées par server.py lorsque le stockage est actif)
+routes = web.RouteTableDef()
+
+
+# Matchs filtrés par statut, tournoi, équipe et saison ; pagination par id (?after=)
+@routes.get('/history/matches')
+async def get_history_matches(request):
+    conditions = []
+    params = []
+    for name, column in (("status", "status"), ("tournament", "tournament")):
+        value = request.query.get(name)
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    season_id = query_number(request, 'season_id')
+    if season_id is not None:
+        conditions.append("season_id = ?")
+        params.append(season_id)
+    team = request.query.get("team")
+    if team:
+        conditions.append("(home_team = ? OR away_team = ?)")
+        params.extend((team, team))
+    after = query_number(request, 'after')
+    if after is not None:
+        conditions.append("id > ?")
+        params.append(after)
+    limit = min(max(query_number(request, 'limit', 100), 1), MAX_HISTORY_LIMIT)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    matches = await storage.fetch(f"SELECT * FROM matches {where} ORDER BY id LIMIT ?", (*params, limit))
+    return web.json_response({
+        "matches": matches,
+        "next": matches[-1]["id"] if len(matches) == limit else None
+    })
+
+
+# Un match avec ses points de cotes, ses incidents et ses lineups
+@routes.get(r'/history/matches/{match_id:\d+}')
+async def get_history_match(request):
+    match_id = int(request.match_info["match_id"])
+
+    def read():
+        matches = storage.query("SELECT * FROM matches WHERE id = ?", (match_id,))
+        if not matches:
+            return None
+        match = matches[0]
+        match["odds"] = storage.query("SELECT ts, home, draw, away FROM odds_ticks WHERE match_id = ? ORDER BY ts", (match_id,))
+        match["incidents"] = [
+            json.loads(row["data"])
+            for row in storage.query("SELECT data FROM incidents WHERE match_id = ? ORDER BY seq", (match_id,))
+        ]
+        players = storage.query("SELECT * FROM lineup_players WHERE match_id = ? ORDER BY side, slot", (match_id,))
+        for player in players:
+            player["statistics"] = json.loads(player["statistics"])
+        match["lineup"] = players
+        return match
+
+    match = await asyncio.to_thread(read)
+    if match is None:
+        return json_error("Match not found", 404)
+    return web.json_response(match)
@@ -0,0 +1,39 @@
+import json
+import pytest
+from decoder import iter_chunks, iter_events
+
+# Décodage incrémental : le résultat ne doit pas dépendre de l'endroit où les blocs sont coupés
+
+PAYLOADS = [
+    {"events": [], "z": 1.5},
+    {"events": [{"id": 1, "x": -12.75e+3}], "hasNextPage": False},
+    {"a": 10, "events": [{"id": 2, "score": 3}, {"id": 3, "odds": 1.0e-2}], "b": -0.5},
+    {"events": [{"id": 4, "name": "Atlético São Paulo ⚽", "t": 1728481500}], "n": None, "t": True},
+    {"meta": {"page": [1, 2.25, -3]}, "events": [{"id": 5, "nested": {"v": [0, 1E5]}}], "end": 123456},
+]
+
+
+def decode(payload, size):
+    content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return list(iter_events(iter_chunks(content, size)))
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_every_chunk_boundary(payload):
+    content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    for size in range(1, len(content) + 1):
+        assert decode(payload, size) == payload["events"], f"chunk size {size}"
+
+
+def test_number_cut_after_dot_at_top_level():
+    assert decode({"events": [], "z": 1.5}, 8) == []
+
+
+def test_number_cut_after_exponent():
+    chunks = [b'{"events": [{"id": 1', b'e', b'2}], "z": 3', b'e', b'-', b'1}']
+    assert list(iter_events(chunks)) == [{"id": 100.0}]
+
+
+def test_truncated_response_raises():
+    with pytest.raises(ValueError):
+        list(iter_events([b'{"events": [{"id": 1}', b', {"id": ']))